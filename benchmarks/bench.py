@@ -0,0 +1,295 @@
+"""
+benchmarks.bench
+~~~~~~~~~~~~~~
+
+This module contains a benchmark runner that times each stage of the
+processing pipeline on synthetic statements.
+Run python3 -m benchmarks.bench --help for more information.
+
+"""
+
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Callable
+
+from tabulate import tabulate
+
+from benchmarks.statements import SERVICES, generate_rows, write_statement
+from models.Transaction import Transaction
+from models.TransactionRow import TransactionRow
+from services.TransactionService import TransactionService
+from utils.choices import OUTPUT_FORMATS
+
+STAGES: tuple[str, ...] = ("parse", "segregate", "book", "sort", "render", "write")
+
+
+def run_pipeline(
+    company: str,
+    input_filename: str,
+    output_filename: str,
+    trace_memory: bool,
+    engine: str = "queue",
+    output_format: str = "xlsx",
+) -> dict[str, dict]:
+    """Run the pipeline once, timing every stage and optionally its peak memory"""
+    service: TransactionService = SERVICES[company](
+        input_filename=input_filename,
+        output_filename=output_filename,
+        engine=engine,
+        console="full",
+        output_format=output_format,
+    )
+    results: dict[str, dict] = {}
+
+    def measure(stage: str, func: Callable, rows: Callable[..., int]):
+        if trace_memory:
+            tracemalloc.reset_peak()
+
+        start: float = time.perf_counter()
+        value = func()
+        seconds: float = time.perf_counter() - start
+
+        results[stage] = {
+            "seconds": seconds,
+            "rows": rows(value),
+            "peak_bytes": tracemalloc.get_traced_memory()[1] if trace_memory else None,
+        }
+        return value
+
+    txn_row_map: dict[str, list[TransactionRow]] = measure(
+        "parse",
+        lambda: service._create_txn_row_map(service._read_file()),
+        lambda value: sum(len(txn_rows) for txn_rows in value.values()),
+    )
+
+    funds: list[tuple[str, list[TransactionRow], list[TransactionRow]]] = measure(
+        "segregate",
+        lambda: [
+            (name, *service._segregate_txns(txn_rows))
+            for name, txn_rows in txn_row_map.items()
+        ],
+        lambda _: results["parse"]["rows"],
+    )
+
+    def book() -> list[Transaction]:
+        final_txns: list[Transaction] = []
+        for name, buy_txns, sell_txns in funds:
+            final_txns.extend(service._process_transactions(name, buy_txns, sell_txns))
+        return final_txns
+
+    final_txns: list[Transaction] = measure("book", book, len)
+
+    sorted_txns: list[Transaction] = measure(
+        "sort",
+        lambda: sorted(final_txns, key=lambda x: (x.buy_date, x.name)),
+        len,
+    )
+
+    def render():
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            with redirect_stdout(devnull):
+                service._print_list(sorted_txns)
+
+    measure("render", render, lambda _: len(sorted_txns))
+    measure("write", lambda: service.save(sorted_txns), lambda _: len(sorted_txns))
+
+    return results
+
+
+def benchmark(
+    company: str,
+    input_filename: str,
+    output_filename: str,
+    repeat: int,
+    engine: str = "queue",
+    output_format: str = "xlsx",
+) -> dict[str, dict]:
+    """Take the best time of several runs, and the peak memory of a traced run"""
+    best: dict[str, dict] = {}
+    for _ in range(repeat):
+        for stage, result in run_pipeline(
+            company, input_filename, output_filename, False, engine, output_format
+        ).items():
+            if stage not in best or result["seconds"] < best[stage]["seconds"]:
+                best[stage] = result
+
+    # Tracing slows every allocation down, so memory gets a run of its own
+    tracemalloc.start()
+    try:
+        traced: dict[str, dict] = run_pipeline(
+            company, input_filename, output_filename, True, engine, output_format
+        )
+    finally:
+        tracemalloc.stop()
+
+    for stage, result in best.items():
+        result["peak_bytes"] = traced[stage]["peak_bytes"]
+        result["rows_per_sec"] = (
+            result["rows"] / result["seconds"] if result["seconds"] > 0 else None
+        )
+
+    return best
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the transaction pipeline")
+    parser.add_argument(
+        "-c",
+        "--companies",
+        nargs="+",
+        choices=SERVICES.keys(),
+        default=list(SERVICES.keys()),
+        help="names of brokerages or repositories to benchmark",
+    )
+    parser.add_argument(
+        "-f", "--funds", type=int, default=100, help="number of funds or stocks"
+    )
+    parser.add_argument(
+        "-r",
+        "--rows-per-fund",
+        type=int,
+        default=100,
+        help="number of orders per fund",
+    )
+    parser.add_argument(
+        "--sell-ratio",
+        type=float,
+        default=0.2,
+        help="share of orders that sell part of the holding",
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=["xlsx", "csv"],
+        default="xlsx",
+        help="format of the generated statements",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="xlsx",
+        help="format of the output file",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["queue", "columnar"],
+        default="queue",
+        help="booking engine to benchmark",
+    )
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=3, help="number of timed runs"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "-o",
+        "--output-filename",
+        metavar="FILENAME",
+        help="JSON file to save the results to",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILENAME",
+        help="JSON results of an earlier run to compare against",
+    )
+
+    args: Namespace = parser.parse_args()
+
+    baseline: dict = {}
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+    results: dict[str, dict[str, dict]] = {}
+    table: list[tuple] = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for company in args.companies:
+            input_filename: str = os.path.join(
+                temp_dir, f"{company}.{args.input_format}"
+            )
+            write_statement(
+                generate_rows(
+                    company,
+                    args.funds,
+                    args.rows_per_fund,
+                    sell_ratio=args.sell_ratio,
+                    seed=args.seed,
+                ),
+                input_filename,
+            )
+
+            results[company] = benchmark(
+                company,
+                input_filename,
+                os.path.join(temp_dir, f"{company}_output.{args.output_format}"),
+                args.repeat,
+                args.engine,
+                args.output_format,
+            )
+
+            for stage in STAGES:
+                result: dict = results[company][stage]
+                previous: dict | None = baseline.get(company, {}).get(stage)
+                table.append(
+                    (
+                        company,
+                        stage,
+                        result["rows"],
+                        f"{result['seconds'] * 1000:.1f}",
+                        f"{result['rows_per_sec'] or 0:,.0f}",
+                        f"{result['peak_bytes'] / 2**20:.1f}",
+                        (
+                            f"{result['seconds'] / previous['seconds']:.2f}x"
+                            if previous is not None and previous["seconds"] > 0
+                            else ""
+                        ),
+                    )
+                )
+
+    print(
+        tabulate(
+            table,
+            headers=[
+                "Company",
+                "Stage",
+                "Rows",
+                "Time (ms)",
+                "Rows/sec",
+                "Peak (MiB)",
+                "vs. baseline",
+            ],
+        )
+    )
+
+    if args.output_filename is not None:
+        with open(args.output_filename, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "timestamp": datetime.now().isoformat(),
+                    "python": platform.python_version(),
+                    "config": {
+                        "funds": args.funds,
+                        "rows_per_fund": args.rows_per_fund,
+                        "sell_ratio": args.sell_ratio,
+                        "input_format": args.input_format,
+                        "engine": args.engine,
+                        "output_format": args.output_format,
+                        "repeat": args.repeat,
+                        "seed": args.seed,
+                    },
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
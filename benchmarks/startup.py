@@ -0,0 +1,142 @@
+"""
+benchmarks.startup
+~~~~~~~~~~~~~~
+
+This module contains a check of the startup time of main.py. It times the
+CLI against a bare interpreter, and fails when a run goes over its budget or
+imports a dependency it does not need.
+Run python3 -m benchmarks.startup --help for more information.
+
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+from tabulate import tabulate
+
+from benchmarks.statements import generate_rows, write_statement
+
+_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules none of the checked runs need, as they print no table, write no
+# workbook and book in a single process
+_UNNEEDED_MODULES: tuple[str, ...] = (
+    "tabulate",
+    "openpyxl",
+    "numpy",
+    "multiprocessing",
+    "services.BatchService",
+)
+
+
+def time_command(command: list[str], repeat: int) -> float:
+    """Return the fastest wall time of a command in milliseconds.
+
+    Other load on the machine only ever slows a run down, so the fastest of
+    several runs is the least disturbed measure of the command itself.
+    """
+    timings: list[float] = []
+
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        subprocess.run(command, cwd=_ROOT, check=True, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return min(timings)
+
+
+def imported_modules(command: list[str]) -> set[str]:
+    """Return the modules a python command imports, from -X importtime"""
+    result = subprocess.run(
+        [command[0], "-X", "importtime", *command[1:]],
+        cwd=_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Check the startup time of main.py")
+    parser.add_argument(
+        "-b",
+        "--budget-ms",
+        type=float,
+        default=75,
+        help="milliseconds each run may take over a bare interpreter",
+    )
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=20, help="number of timed runs"
+    )
+
+    args: Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_filename: str = os.path.join(temp_dir, "cams.csv")
+        write_statement(generate_rows("cams", 5, 10), input_filename)
+
+        main_py: list[str] = [sys.executable, "main.py"]
+        runs: dict[str, list[str]] = {
+            "help": [*main_py, "--help"],
+            "process help": [*main_py, "process", "--help"],
+            "small csv run": [
+                *main_py,
+                "process",
+                "cams",
+                "-i",
+                input_filename,
+                "-o",
+                os.path.join(temp_dir, "output.csv"),
+                "-f",
+                "csv",
+                "--console",
+                "none",
+            ],
+        }
+
+        interpreter_ms: float = time_command(
+            [sys.executable, "-c", "pass"], args.repeat
+        )
+
+        table: list[tuple] = []
+        failed: bool = False
+        for name, command in runs.items():
+            overhead_ms: float = time_command(command, args.repeat) - interpreter_ms
+            unneeded: set[str] = imported_modules(command).intersection(
+                _UNNEEDED_MODULES
+            )
+
+            ok: bool = overhead_ms <= args.budget_ms and len(unneeded) == 0
+            failed = failed or not ok
+            table.append(
+                (
+                    name,
+                    f"{overhead_ms:.1f}",
+                    ", ".join(sorted(unneeded)),
+                    "OK" if ok else "FAILED",
+                )
+            )
+
+    print(f"Interpreter startup: {interpreter_ms:.1f} ms")
+    print(
+        tabulate(
+            table,
+            headers=["Run", "Overhead (ms)", "Unneeded imports", "Status"],
+        )
+    )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
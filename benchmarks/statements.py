@@ -0,0 +1,191 @@
+"""
+benchmarks.statements
+~~~~~~~~~~~~~~
+
+This module contains a generator of synthetic CAMS, KFintech and Zerodha
+statements, laid out exactly as the services read them.
+Run python3 -m benchmarks.statements --help for more information.
+
+"""
+
+import csv
+import random
+from argparse import ArgumentParser, Namespace
+from datetime import date, timedelta
+from decimal import Decimal
+
+from services.CamsService import CamsService
+from services.KfintechService import KfintechService
+from services.TransactionService import TransactionService
+from services.ZerodhaService import ZerodhaService
+
+SERVICES: dict[str, type[TransactionService]] = {
+    "cams": CamsService,
+    "kfintech": KfintechService,
+    "zerodha": ZerodhaService,
+}
+
+_START_DATE: date = date(2015, 1, 1)
+
+
+def generate_rows(
+    company: str,
+    funds: int,
+    rows_per_fund: int,
+    sell_ratio: float = 0.2,
+    fill_ratio: float = 0.1,
+    seed: int = 0,
+) -> list[list]:
+    """Generate statement rows for a company, including its leading rows"""
+    service: type[TransactionService] = SERVICES[company]
+    is_zerodha: bool = company == "zerodha"
+    width: int = (
+        max(
+            service._NAME_COL,
+            service._DATE_COL,
+            service._QTY_COL,
+            service._PRICE_COL,
+            getattr(service, "_BUY_SELL_COL", 0),
+        )
+        + 1
+    )
+
+    rnd = random.Random(seed)
+    txns: list[tuple[date, int, str, str, Decimal, Decimal]] = []
+
+    for fund in range(funds):
+        name: str = f"STOCK{fund:05d}" if is_zerodha else f"Fund {fund:05d} - Growth"
+        held = Decimal(0)
+        day = _START_DATE + timedelta(days=rnd.randrange(30))
+        price = Decimal(rnd.randrange(1000, 50000)) / 100
+
+        for _ in range(rows_per_fund):
+            day += timedelta(days=rnd.randrange(1, 31))
+            price = max(Decimal(1), price + Decimal(rnd.randrange(-300, 320)) / 100)
+
+            # Sell part of the holding, or buy like a monthly SIP
+            if held > 0 and rnd.random() < sell_ratio:
+                qty = min(held, _random_qty(rnd, is_zerodha))
+                held -= qty
+                side = "sell"
+            else:
+                qty = _random_qty(rnd, is_zerodha)
+                held += qty
+                side = "buy"
+
+            txns.append((day, fund, name, side, qty, price))
+
+            # Fill the order again on the same day and price
+            if is_zerodha and rnd.random() < fill_ratio:
+                if side == "buy":
+                    held += qty
+                elif held >= qty:
+                    held -= qty
+                else:
+                    continue
+
+                txns.append((day, fund, name, side, qty, price))
+
+    # Statements list every fund's rows by date
+    txns.sort(key=lambda txn: (txn[0], txn[1]))
+
+    rows: list[list] = [
+        [f"Header {col}" for col in range(width)] for _ in range(service._FIRST_ROW)
+    ]
+
+    for day, _, name, side, qty, price in txns:
+        row: list = [None] * width
+        row[service._NAME_COL] = name
+        row[service._DATE_COL] = day.strftime(service._DATE_FORMAT)
+        row[service._PRICE_COL] = float(price)
+
+        if is_zerodha:
+            row[service._BUY_SELL_COL] = side
+            row[service._QTY_COL] = int(qty)
+        else:
+            row[service._QTY_COL] = float(qty if side == "buy" else -qty)
+
+        rows.append(row)
+
+    return rows
+
+
+def write_statement(rows: list[list], file_name: str):
+    """Write statement rows as a CSV file or an xlsx workbook, by extension"""
+    if file_name.endswith(".csv"):
+        with open(file_name, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerows(
+                ["" if cell is None else cell for cell in row] for row in rows
+            )
+        return
+
+    from openpyxl import Workbook
+
+    workbook: Workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Statement")
+    for row in rows:
+        sheet.append(row)
+
+    workbook.save(file_name)
+
+
+def _random_qty(rnd: random.Random, is_zerodha: bool) -> Decimal:
+    if is_zerodha:
+        return Decimal(rnd.randrange(1, 50))
+
+    return Decimal(rnd.randrange(1000, 200000)) / 1000
+
+
+def main():
+    parser = ArgumentParser(description="Generate a synthetic transaction statement")
+    parser.add_argument(
+        "company", choices=SERVICES.keys(), help="name of brokerage or repository"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-filename",
+        metavar="FILENAME",
+        required=True,
+        help="statement file to write, csv or xlsx by extension",
+    )
+    parser.add_argument(
+        "-f", "--funds", type=int, default=100, help="number of funds or stocks"
+    )
+    parser.add_argument(
+        "-r",
+        "--rows-per-fund",
+        type=int,
+        default=100,
+        help="number of orders per fund",
+    )
+    parser.add_argument(
+        "--sell-ratio",
+        type=float,
+        default=0.2,
+        help="share of orders that sell part of the holding",
+    )
+    parser.add_argument(
+        "--fill-ratio",
+        type=float,
+        default=0.1,
+        help="share of zerodha orders filled twice on the same day and price",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    args: Namespace = parser.parse_args()
+
+    write_statement(
+        generate_rows(
+            args.company,
+            args.funds,
+            args.rows_per_fund,
+            args.sell_ratio,
+            args.fill_ratio,
+            args.seed,
+        ),
+        args.output_filename,
+    )
+
+
+if __name__ == "__main__":
+    main()
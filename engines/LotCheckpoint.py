@@ -0,0 +1,65 @@
+"""
+engines.lotcheckpoint
+~~~~~~~~~~~~~~
+
+This module contains methods to persist the lot state of every fund between
+runs, so that a later run only books the rows appended since.
+
+"""
+
+import json
+import logging
+import os
+from hashlib import sha256
+from typing import Iterable
+
+from models.TransactionRow import TransactionRow
+
+_VERSION: int = 2
+
+
+def hash_rows(rows: Iterable[TransactionRow]) -> str:
+    """Hash transaction rows, so that changes to already booked rows are found"""
+    digest = sha256()
+
+    for row in rows:
+        buy_sell: str = row.buy_sell.value if row.buy_sell is not None else ""
+        digest.update(
+            f"{buy_sell}|{row.qty}|{row.date.isoformat()}|{row.price}\n".encode()
+        )
+
+    return digest.hexdigest()
+
+
+def load_checkpoint(file_name: str, layout: dict) -> dict[str, dict]:
+    """Load the per fund checkpoints, or none if the file is missing or stale"""
+    try:
+        with open(file_name, encoding="utf-8") as file:
+            checkpoint: dict = json.load(file)
+    except FileNotFoundError:
+        logging.info("No checkpoint found at %s, booking all rows", file_name)
+        return {}
+    except Exception as e:
+        logging.error("Ignoring unreadable checkpoint %s: %s", file_name, e)
+        return {}
+
+    if checkpoint.get("version") != _VERSION or checkpoint.get("layout") != layout:
+        logging.warning("Ignoring checkpoint %s of another layout", file_name)
+        return {}
+
+    return checkpoint["funds"]
+
+
+def save_checkpoint(file_name: str, layout: dict, funds: dict[str, dict]):
+    """Save the per fund checkpoints, replacing the file atomically"""
+    temp_file_name: str = file_name + ".tmp"
+
+    try:
+        with open(temp_file_name, "w", encoding="utf-8") as file:
+            json.dump({"version": _VERSION, "layout": layout, "funds": funds}, file)
+
+        os.replace(temp_file_name, file_name)
+
+        logging.info("Saved checkpoint to %s", file_name)
+    except Exception as e:
+        logging.error("An error occurred: %s", e)
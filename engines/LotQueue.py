@@ -0,0 +1,381 @@
+"""
+engines.lotqueue
+~~~~~~~~~~~~~~
+
+This module contains a store of open lots used to book sell transactions,
+under a choice of lot-matching policies.
+
+"""
+
+import heapq
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Self
+
+from enums.TransactionType import TransactionType
+from models.FundSummary import FundSummary
+from models.Transaction import Transaction
+from models.TransactionRow import TransactionRow
+from utils.choices import POLICIES, check_choice
+
+_AVERAGE_PRICE_PLACES: Decimal = Decimal("0.0001")
+
+
+class LotQueue:
+    """A class representing the open lots of a single fund, indexed by policy"""
+
+    _name: str
+    _policy: str
+    _lots: deque[Transaction]
+    _heap: list[tuple[Decimal, int, Transaction]]
+    _buy_seq: int
+    _booked: list[Transaction]
+    _buy_count: int
+    _sell_count: int
+    _unfilled_qty: Decimal
+    _held_qty: Decimal
+    _held_cost: Decimal
+    _long_term: timedelta | None
+    _sold_qty: Decimal
+    _sold_value: Decimal
+    _sold_cost: Decimal
+    _short_term_gain: Decimal
+    _long_term_gain: Decimal
+    _last_date: datetime | None
+    _last_price: Decimal | None
+
+    def __init__(
+        self: Self,
+        name: str,
+        policy: str = "fifo",
+        long_term_days: int | None = None,
+    ) -> None:
+        # A policy of another name would be booked oldest lot first
+        check_choice("policy", policy, POLICIES)
+
+        self._name = name
+        self._policy = policy
+        # Lots in buy order for fifo, lifo and average, or a heap for hifo
+        self._lots = deque()
+        self._heap = []
+        self._buy_seq = 0
+        self._booked = []
+        self._buy_count = 0
+        self._sell_count = 0
+        self._unfilled_qty = Decimal(0)
+        # Running totals of the open lots, for average cost and the summary
+        self._held_qty = Decimal(0)
+        self._held_cost = Decimal(0)
+        # Gains are summarized as lots are booked, when given a holding period
+        # past which a gain is long term
+        self._long_term = (
+            timedelta(days=long_term_days) if long_term_days is not None else None
+        )
+        self._sold_qty = Decimal(0)
+        self._sold_value = Decimal(0)
+        self._sold_cost = Decimal(0)
+        self._short_term_gain = Decimal(0)
+        self._long_term_gain = Decimal(0)
+        self._last_date = None
+        self._last_price = None
+
+    @property
+    def name(self: Self) -> str:
+        return self._name
+
+    @property
+    def policy(self: Self) -> str:
+        return self._policy
+
+    @property
+    def buy_count(self: Self) -> int:
+        return self._buy_count
+
+    @property
+    def sell_count(self: Self) -> int:
+        return self._sell_count
+
+    @property
+    def unfilled_qty(self: Self) -> Decimal:
+        return self._unfilled_qty
+
+    def buy(self: Self, buy_txn: TransactionRow) -> None:
+        """Add a buy transaction as a new open lot"""
+        self._buy_count += 1
+        if self._long_term is not None:
+            self._observe_price(buy_txn)
+
+        self._push(
+            Transaction(
+                name=self._name,
+                buy_sell=TransactionType.BUY,
+                qty=buy_txn.qty,
+                buy_date=buy_txn.date,
+                buy_price=buy_txn.price,
+            )
+        )
+
+    def sell(self: Self, sell_txn: TransactionRow) -> None:
+        """Book a sell transaction against the open lots the policy picks"""
+        self._sell_count += 1
+        if self._long_term is not None:
+            self._observe_price(sell_txn)
+
+        qty_to_sell: Decimal = abs(sell_txn.qty)
+
+        while qty_to_sell > 0 and self._has_lots():
+            lot: Transaction = self._peek()
+
+            # Sufficient quantity to sell -> sell the whole lot and move on
+            if qty_to_sell >= lot.qty:
+                self._pop()
+                self._book(lot, sell_txn)
+
+                qty_to_sell -= lot.qty
+
+            # Insufficient quantity to sell -> split the lot into 2
+            else:
+                remaining_lot = Transaction(
+                    name=lot.name,
+                    buy_sell=TransactionType.BUY,
+                    qty=lot.qty - qty_to_sell,
+                    buy_date=lot.buy_date,
+                    buy_price=lot.buy_price,
+                )
+
+                lot.qty = qty_to_sell
+                self._replace(remaining_lot)
+                self._book(lot, sell_txn)
+
+                qty_to_sell = Decimal(0)
+
+        # Quantity left over once every open lot is sold
+        self._unfilled_qty += qty_to_sell
+
+    def open_lots(self: Self) -> list[Transaction]:
+        """Return the open lots, oldest first"""
+        if self._policy == "hifo":
+            return [lot for _, _, lot in sorted(self._heap, key=lambda x: x[1])]
+
+        return list(self._lots)
+
+    def settle(
+        self: Self,
+        booked: list[Transaction],
+        open_lots: list[Transaction],
+        buy_count: int,
+        sell_count: int,
+        unfilled_qty: Decimal,
+    ) -> None:
+        """Record buys and sells that were booked outside a fifo queue"""
+        self._booked.extend(booked)
+        self._lots = deque(open_lots)
+        self._buy_count += buy_count
+        self._sell_count += sell_count
+        self._unfilled_qty += unfilled_qty
+
+    def transactions(self: Self) -> list[Transaction]:
+        """Return the booked lots followed by the open lots, oldest first"""
+        open_lots: list[Transaction] = self.open_lots()
+
+        # Open lots are valued at the average cost as well
+        if self._policy == "average" and self._held_qty > 0:
+            price: Decimal = self._average_price()
+            open_lots = [
+                Transaction(
+                    name=lot.name,
+                    buy_sell=lot.buy_sell,
+                    qty=lot.qty,
+                    buy_date=lot.buy_date,
+                    buy_price=price,
+                )
+                for lot in open_lots
+            ]
+
+        return self._booked + open_lots
+
+    def summary(self: Self) -> FundSummary:
+        """Return the gains summarized so far, if given a holding period"""
+        return FundSummary(
+            name=self._name,
+            policy=self._policy,
+            sold_qty=self._sold_qty,
+            sold_value=self._sold_value,
+            sold_cost=self._sold_cost,
+            short_term_gain=self._short_term_gain,
+            long_term_gain=self._long_term_gain,
+            held_qty=self._held_qty,
+            held_cost=self._held_cost,
+            last_price=self._last_price,
+        )
+
+    def to_state(self: Self) -> dict:
+        """Convert the queue to a JSON serializable state"""
+        return {
+            "policy": self._policy,
+            "buy_count": self._buy_count,
+            "sell_count": self._sell_count,
+            "unfilled_qty": str(self._unfilled_qty),
+            "held_qty": str(self._held_qty),
+            "held_cost": str(self._held_cost),
+            "gains": [
+                str(self._sold_qty),
+                str(self._sold_value),
+                str(self._sold_cost),
+                str(self._short_term_gain),
+                str(self._long_term_gain),
+            ],
+            "last_date": (
+                self._last_date.isoformat() if self._last_date is not None else None
+            ),
+            "last_price": (
+                str(self._last_price) if self._last_price is not None else None
+            ),
+            "booked": [_lot_to_state(lot) for lot in self._booked],
+            "open": [_lot_to_state(lot) for lot in self.open_lots()],
+        }
+
+    @classmethod
+    def from_state(
+        cls: type[Self], name: str, state: dict, long_term_days: int | None = None
+    ) -> Self:
+        """Create a queue from a state returned by to_state"""
+        lot_queue: Self = cls(name, state["policy"], long_term_days)
+        lot_queue._buy_count = state["buy_count"]
+        lot_queue._sell_count = state["sell_count"]
+        lot_queue._unfilled_qty = Decimal(state["unfilled_qty"])
+        lot_queue._booked = [_lot_from_state(name, lot) for lot in state["booked"]]
+
+        # Open lots are pushed without touching the restored running totals
+        for lot in state["open"]:
+            lot_queue._push(_lot_from_state(name, lot), track_cost=False)
+
+        lot_queue._held_qty = Decimal(state["held_qty"])
+        lot_queue._held_cost = Decimal(state["held_cost"])
+
+        (
+            lot_queue._sold_qty,
+            lot_queue._sold_value,
+            lot_queue._sold_cost,
+            lot_queue._short_term_gain,
+            lot_queue._long_term_gain,
+        ) = (Decimal(value) for value in state["gains"])
+
+        if state["last_date"] is not None:
+            lot_queue._last_date = datetime.fromisoformat(state["last_date"])
+            lot_queue._last_price = Decimal(state["last_price"])
+
+        return lot_queue
+
+    def _push(self: Self, lot: Transaction, track_cost: bool = True) -> None:
+        if track_cost and (self._policy == "average" or self._long_term is not None):
+            self._held_qty += lot.qty
+            self._held_cost += lot.qty * lot.buy_price
+
+        if self._policy == "hifo":
+            heapq.heappush(self._heap, (-lot.buy_price, self._buy_seq, lot))
+            self._buy_seq += 1
+        else:
+            self._lots.append(lot)
+
+    def _has_lots(self: Self) -> bool:
+        return len(self._heap if self._policy == "hifo" else self._lots) > 0
+
+    def _peek(self: Self) -> Transaction:
+        if self._policy == "hifo":
+            return self._heap[0][2]
+        if self._policy == "lifo":
+            return self._lots[-1]
+
+        return self._lots[0]
+
+    def _pop(self: Self) -> None:
+        if self._policy == "hifo":
+            heapq.heappop(self._heap)
+        elif self._policy == "lifo":
+            self._lots.pop()
+        else:
+            self._lots.popleft()
+
+    def _replace(self: Self, lot: Transaction) -> None:
+        # The remaining lot keeps the place, and so the heap order, of the lot
+        if self._policy == "hifo":
+            price, seq, _ = self._heap[0]
+            self._heap[0] = (price, seq, lot)
+        elif self._policy == "lifo":
+            self._lots[-1] = lot
+        else:
+            self._lots[0] = lot
+
+    def _book(self: Self, lot: Transaction, sell_txn: TransactionRow) -> None:
+        cost: Decimal | None = None
+        if self._policy == "average":
+            average: Decimal = self._held_cost / self._held_qty
+            lot.buy_price = average.quantize(_AVERAGE_PRICE_PLACES)
+            cost = lot.qty * average
+        elif self._long_term is not None:
+            cost = lot.qty * lot.buy_price
+
+        if cost is not None:
+            self._held_qty -= lot.qty
+            self._held_cost = (
+                self._held_cost - cost if self._held_qty > 0 else Decimal(0)
+            )
+
+        lot.buy_sell = TransactionType.SELL
+        lot.sell_date = sell_txn.date
+        lot.sell_price = sell_txn.price
+
+        # Gains are on the booked price, so they add up to those of the lots
+        if self._long_term is not None:
+            self._record_sale(lot, lot.qty * lot.buy_price)
+
+        self._booked.append(lot)
+
+    def _record_sale(self: Self, lot: Transaction, cost: Decimal) -> None:
+        """Add a booked lot to the realized gains, by its holding period"""
+        value: Decimal = lot.qty * lot.sell_price
+
+        self._sold_qty += lot.qty
+        self._sold_value += value
+        self._sold_cost += cost
+
+        if lot.sell_date - lot.buy_date > self._long_term:
+            self._long_term_gain += value - cost
+        else:
+            self._short_term_gain += value - cost
+
+    def _observe_price(self: Self, txn: TransactionRow) -> None:
+        # The latest price in the statement values the units still held
+        if self._last_date is None or txn.date >= self._last_date:
+            self._last_date = txn.date
+            self._last_price = txn.price
+
+    def _average_price(self: Self) -> Decimal:
+        return (self._held_cost / self._held_qty).quantize(_AVERAGE_PRICE_PLACES)
+
+
+def _lot_to_state(lot: Transaction) -> list:
+    return [
+        lot.buy_sell.value,
+        str(lot.qty),
+        lot.buy_date.isoformat(),
+        str(lot.buy_price),
+        lot.sell_date.isoformat() if lot.sell_date is not None else None,
+        str(lot.sell_price) if lot.sell_price is not None else None,
+    ]
+
+
+def _lot_from_state(name: str, state: list) -> Transaction:
+    buy_sell, qty, buy_date, buy_price, sell_date, sell_price = state
+
+    return Transaction(
+        name=name,
+        buy_sell=TransactionType(buy_sell),
+        qty=Decimal(qty),
+        buy_date=datetime.fromisoformat(buy_date),
+        buy_price=Decimal(buy_price),
+        sell_date=datetime.fromisoformat(sell_date) if sell_date is not None else None,
+        sell_price=Decimal(sell_price) if sell_price is not None else None,
+    )
@@ -0,0 +1,183 @@
+"""
+engines.parsecache
+~~~~~~~~~~~~~~
+
+This module contains methods to cache the decoded rows of a statement by the
+hash of its content, so that a repeat run skips reading and parsing it.
+
+"""
+
+import json
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from hashlib import sha256
+
+from enums.TransactionType import TransactionType
+from models.TransactionRow import TransactionRow
+
+_VERSION: int = 1
+_MAGIC: bytes = b"PTXC"
+_SUFFIX: str = ".rows"
+_READ_SIZE: int = 1 << 20
+
+# Dates are stored as whole microseconds since this epoch
+_EPOCH: datetime = datetime(1970, 1, 1)
+_MICROSECOND: timedelta = timedelta(microseconds=1)
+
+
+def cache_key(file_name: str, layout: dict) -> str:
+    """Key a statement by its content and the layout it is decoded with"""
+    digest = sha256(json.dumps([_VERSION, layout], sort_keys=True).encode())
+
+    with open(file_name, "rb") as file:
+        while chunk := file.read(_READ_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_rows(cache_dir: str, key: str) -> dict[str, list[TransactionRow]] | None:
+    """Load the decoded rows of each fund, or None if they are not cached"""
+    file_name: str = os.path.join(cache_dir, key + _SUFFIX)
+
+    try:
+        with open(file_name, "rb") as file:
+            data: bytes = file.read()
+    except FileNotFoundError:
+        return None
+
+    try:
+        if not data.startswith(_MAGIC):
+            raise ValueError("not a cache file")
+
+        funds: list = json.loads(zlib.decompress(data[len(_MAGIC) :]))
+        txn_row_map: dict[str, list[TransactionRow]] = _decode_funds(funds)
+    except Exception as e:
+        logging.error("Ignoring unreadable cache file %s: %s", file_name, e)
+        return None
+
+    # Hits are kept fresh, so eviction drops the least recently used first
+    os.utime(file_name)
+
+    logging.info("Loaded parsed rows from %s", file_name)
+
+    return txn_row_map
+
+
+def save_rows(
+    cache_dir: str,
+    key: str,
+    txn_row_map: dict[str, list[TransactionRow]],
+    max_bytes: int,
+):
+    """Save the decoded rows of each fund, then evict down to max_bytes"""
+    file_name: str = os.path.join(cache_dir, key + _SUFFIX)
+    temp_file_name: str = f"{file_name}.{os.getpid()}.tmp"
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        data: bytes = zlib.compress(
+            json.dumps(_encode_funds(txn_row_map), separators=(",", ":")).encode(),
+            1,
+        )
+
+        with open(temp_file_name, "wb") as file:
+            file.write(_MAGIC + data)
+
+        os.replace(temp_file_name, file_name)
+
+        logging.info("Saved parsed rows to %s", file_name)
+
+        evict(cache_dir, max_bytes)
+    except Exception as e:
+        logging.error("An error occurred: %s", e)
+
+
+def evict(cache_dir: str, max_bytes: int):
+    """Remove the least recently used cache files until they fit in max_bytes"""
+    entries: list[tuple[float, int, str]] = []
+
+    with os.scandir(cache_dir) as scan:
+        for entry in scan:
+            if not entry.name.endswith(_SUFFIX):
+                continue
+
+            # Another process may evict the same file in between
+            try:
+                stat: os.stat_result = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total: int = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+
+        try:
+            os.remove(path)
+            logging.debug("Evicted %s from the parse cache", path)
+        except FileNotFoundError:
+            pass
+
+        total -= size
+
+
+def _encode_funds(txn_row_map: dict[str, list[TransactionRow]]) -> list:
+    # Each fund is stored as columns, with its numbers joined into one string,
+    # so the file has a handful of values per fund rather than per row
+    return [
+        [
+            name,
+            "\n".join(
+                row.buy_sell.value if row.buy_sell is not None else ""
+                for row in txn_rows
+            ),
+            "\n".join(str(row.qty) for row in txn_rows),
+            [(row.date - _EPOCH) // _MICROSECOND for row in txn_rows],
+            "\n".join(str(row.price) for row in txn_rows),
+        ]
+        for name, txn_rows in txn_row_map.items()
+    ]
+
+
+def _decode_funds(funds: list) -> dict[str, list[TransactionRow]]:
+    txn_row_map: dict[str, list[TransactionRow]] = {}
+
+    # Statements repeat their dates and prices across rows and funds, so each
+    # distinct one is converted once
+    dates: dict[int, datetime] = {}
+    prices: dict[str, Decimal] = {}
+    buy_sells: dict[str, TransactionType | None] = {"": None}
+
+    for name, buy_sell_col, qty_col, date_col, price_col in funds:
+        txn_rows: list[TransactionRow] = []
+
+        for buy_sell, qty, date, price in zip(
+            buy_sell_col.split("\n"),
+            qty_col.split("\n"),
+            date_col,
+            price_col.split("\n"),
+        ):
+            if date not in dates:
+                dates[date] = _EPOCH + date * _MICROSECOND
+            if price not in prices:
+                prices[price] = Decimal(price)
+            if buy_sell not in buy_sells:
+                buy_sells[buy_sell] = TransactionType(buy_sell)
+
+            txn_rows.append(
+                TransactionRow(
+                    Decimal(qty), dates[date], prices[price], buy_sells[buy_sell]
+                )
+            )
+
+        txn_row_map[name] = txn_rows
+
+    return txn_row_map
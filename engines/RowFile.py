@@ -0,0 +1,326 @@
+"""
+engines.rowfile
+~~~~~~~~~~~~~~
+
+This module contains methods to write decoded statement rows to a columnar
+binary file, and to read them back through mmap without copying.
+
+A row file is little-endian. It starts with a 32 byte header:
+
+    magic        4 bytes   b"PTXR"
+    version      uint16    2
+    reserved     uint16    0
+    fund_count   uint32    number of funds
+    row_count    uint64    number of rows
+    qty_scale    uint8     decimal places every quantity is scaled by
+    price_scale  uint8     decimal places every price is scaled by
+    padding      2 bytes
+    layout_size  uint32    size of the layout
+    padding      4 bytes
+
+followed by these sections, in order, each padded to 8 bytes:
+
+    layout       bytes                  UTF-8 JSON of the layout that decoded
+                                        the rows, so another is not misread
+    fund_starts  int64[fund_count + 1]  first row of each fund, then row_count
+    name_ends    int64[fund_count + 1]  0, then the end of each fund's name
+    names        bytes                  UTF-8 fund names, back to back
+    qty          int64[row_count]       quantity * 10 ** qty_scale
+    price        int64[row_count]       price * 10 ** price_scale
+    fund         int32[row_count]       index of the row's fund
+    day          int32[row_count]       days since 1970-01-01
+    side         int8[row_count]        0 if not given, 1 buy, 2 sell
+    qty_exp      int8[row_count]        decimal exponent the quantity had
+    price_exp    int8[row_count]        decimal exponent the price had
+
+The rows of a fund are contiguous and in statement order. The exponents keep
+each number's own notation, so "10.50" reads back as "10.50" and not "10.5".
+
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, Self, Sequence, overload
+
+from enums.TransactionType import TransactionType
+from models.TransactionRow import TransactionRow
+
+_MAGIC: bytes = b"PTXR"
+_VERSION: int = 2
+_HEADER: struct.Struct = struct.Struct("<4sHHIQBB2xI4x")
+
+_EPOCH: datetime = datetime(1970, 1, 1)
+_SIDES: tuple[TransactionType | None, ...] = (
+    None,
+    TransactionType.BUY,
+    TransactionType.SELL,
+)
+_INT64_MAX: int = (1 << 63) - 1
+
+# Files opened to read fund rows sent to this process, mapped once each
+_OPEN_FILES: dict[str, "RowFile"] = {}
+
+
+def is_row_file(file_name: str) -> bool:
+    """Checks the magic number of the file to find a row file"""
+    try:
+        with open(file_name, "rb") as file:
+            return file.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        # Let the statement readers report the missing or unreadable file
+        return False
+
+
+def write_row_file(
+    file_name: str, txn_row_map: dict[str, Sequence[TransactionRow]], layout: dict
+):
+    """Write the decoded rows of each fund to a row file, replacing it atomically.
+
+    The layout that decoded the rows is stored with them, so that a reader
+    can tell the rows of another statement layout from its own.
+    """
+    _check_byte_order()
+
+    rows: list[TransactionRow] = []
+    fund_starts: array = array("q", [0])
+    name_ends: array = array("q", [0])
+    names: bytearray = bytearray()
+    funds: array = array("i")
+
+    for index, (name, txn_rows) in enumerate(txn_row_map.items()):
+        rows.extend(txn_rows)
+        fund_starts.append(len(rows))
+        names.extend(name.encode())
+        name_ends.append(len(names))
+        funds.extend([index] * len(txn_rows))
+
+    qty_exps: array = array("b", [_exponent(row.qty) for row in rows])
+    price_exps: array = array("b", [_exponent(row.price) for row in rows])
+    qty_scale: int = max(0, -min(qty_exps, default=0))
+    price_scale: int = max(0, -min(price_exps, default=0))
+
+    days: array = array("i")
+    for row in rows:
+        if row.date.time() != datetime.min.time():
+            raise ValueError(f"Row file dates hold no time of day: {row.date}")
+
+        days.append((row.date - _EPOCH).days)
+
+    layout_bytes: bytes = json.dumps(layout, sort_keys=True).encode()
+
+    sections: list[bytes] = [
+        _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            0,
+            len(txn_row_map),
+            len(rows),
+            qty_scale,
+            price_scale,
+            len(layout_bytes),
+        ),
+        layout_bytes,
+        fund_starts.tobytes(),
+        name_ends.tobytes(),
+        bytes(names),
+        _scale(rows, "qty", qty_scale).tobytes(),
+        _scale(rows, "price", price_scale).tobytes(),
+        funds.tobytes(),
+        days.tobytes(),
+        array("b", [_SIDES.index(row.buy_sell) for row in rows]).tobytes(),
+        qty_exps.tobytes(),
+        price_exps.tobytes(),
+    ]
+
+    temp_file_name: str = file_name + ".tmp"
+
+    with open(temp_file_name, "wb") as file:
+        for section in sections:
+            file.write(section)
+            file.write(bytes(-len(section) % 8))
+
+    os.replace(temp_file_name, file_name)
+
+    logging.info("Saved %s rows to %s", len(rows), file_name)
+
+
+class RowFile:
+    """A class representing a row file, read through a memory map"""
+
+    _file_name: str
+    _mmap: mmap.mmap
+    _layout: dict
+    _names: list[str]
+    _fund_starts: memoryview
+    _qty_scale: int
+    _price_scale: int
+    _qty: memoryview
+    _price: memoryview
+    _fund: memoryview
+    _day: memoryview
+    _side: memoryview
+    _qty_exp: memoryview
+    _price_exp: memoryview
+    _dates: dict[int, datetime]
+
+    def __init__(self: Self, file_name: str) -> None:
+        _check_byte_order()
+
+        self._file_name = file_name
+
+        with open(file_name, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer: memoryview = memoryview(self._mmap)
+
+        (
+            magic,
+            version,
+            _,
+            fund_count,
+            row_count,
+            self._qty_scale,
+            self._price_scale,
+            layout_size,
+        ) = _HEADER.unpack_from(buffer)
+
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Not a version {_VERSION} row file: {file_name}")
+
+        # Each section is a view of the mapped file, so nothing is copied
+        offset: int = _HEADER.size
+
+        def take(size: int, format: str | None = None) -> memoryview:
+            nonlocal offset
+            section: memoryview = buffer[offset : offset + size]
+            offset += size + -size % 8
+            return section.cast(format) if format is not None else section
+
+        self._layout = json.loads(str(take(layout_size), "utf-8"))
+        self._fund_starts = take(8 * (fund_count + 1), "q")
+        name_ends: memoryview = take(8 * (fund_count + 1), "q")
+        names: memoryview = take(name_ends[-1])
+        self._qty = take(8 * row_count, "q")
+        self._price = take(8 * row_count, "q")
+        self._fund = take(4 * row_count, "i")
+        self._day = take(4 * row_count, "i")
+        self._side = take(row_count, "b")
+        self._qty_exp = take(row_count, "b")
+        self._price_exp = take(row_count, "b")
+
+        self._names = [
+            str(names[start:end], "utf-8")
+            for start, end in zip(name_ends[:-1], name_ends[1:])
+        ]
+        self._dates = {}
+
+    @property
+    def file_name(self: Self) -> str:
+        return self._file_name
+
+    @property
+    def layout(self: Self) -> dict:
+        return self._layout
+
+    def funds(self: Self) -> dict[str, "FundRows"]:
+        """Return the rows of each fund, decoded only as they are read"""
+        return {name: FundRows(self, index) for index, name in enumerate(self._names)}
+
+    def fund_range(self: Self, index: int) -> range:
+        """Return the rows of a fund, by index"""
+        return range(self._fund_starts[index], self._fund_starts[index + 1])
+
+    def row(self: Self, i: int) -> TransactionRow:
+        """Decode a row, by index"""
+        day: int = self._day[i]
+        date: datetime | None = self._dates.get(day)
+        if date is None:
+            date = self._dates[day] = _EPOCH + timedelta(days=day)
+
+        return TransactionRow(
+            _to_decimal(self._qty[i], self._qty_scale, self._qty_exp[i]),
+            date,
+            _to_decimal(self._price[i], self._price_scale, self._price_exp[i]),
+            _SIDES[self._side[i]],
+        )
+
+    def __reduce__(self):
+        # Sent to another process by name, so it maps the file itself
+        return _open_row_file, (self._file_name,)
+
+
+class FundRows(Sequence[TransactionRow]):
+    """A class representing the rows of one fund in a row file"""
+
+    _row_file: RowFile
+    _rows: range
+
+    def __init__(self: Self, row_file: RowFile, index: int) -> None:
+        self._row_file = row_file
+        self._rows = row_file.fund_range(index)
+
+    def __len__(self: Self) -> int:
+        return len(self._rows)
+
+    @overload
+    def __getitem__(self: Self, i: int) -> TransactionRow: ...
+
+    @overload
+    def __getitem__(self: Self, i: slice) -> list[TransactionRow]: ...
+
+    def __getitem__(self: Self, i: int | slice) -> TransactionRow | list:
+        if isinstance(i, slice):
+            return [self._row_file.row(j) for j in self._rows[i]]
+
+        return self._row_file.row(self._rows[i])
+
+    def __iter__(self: Self) -> Iterator[TransactionRow]:
+        row = self._row_file.row
+        return (row(i) for i in self._rows)
+
+
+def _open_row_file(file_name: str) -> RowFile:
+    row_file: RowFile | None = _OPEN_FILES.get(file_name)
+    if row_file is None:
+        row_file = _OPEN_FILES[file_name] = RowFile(file_name)
+
+    return row_file
+
+
+def _check_byte_order():
+    # Sections are cast to native integers, which must be little-endian
+    if sys.byteorder != "little":
+        raise OSError("Row files are only supported on little-endian machines")
+
+
+def _exponent(value: Decimal) -> int:
+    exponent: int | str = value.as_tuple().exponent
+    if not isinstance(exponent, int) or not -128 <= exponent <= 127:
+        raise ValueError(f"Row files cannot hold {value}")
+
+    return exponent
+
+
+def _scale(rows: list[TransactionRow], attr: str, scale: int) -> array:
+    scaled: array = array("q")
+
+    for row in rows:
+        value: int = int(getattr(row, attr).scaleb(scale))
+        if abs(value) > _INT64_MAX:
+            raise ValueError(f"Row files cannot hold {getattr(row, attr)}")
+
+        scaled.append(value)
+
+    return scaled
+
+
+def _to_decimal(scaled: int, scale: int, exponent: int) -> Decimal:
+    # Drops the zeros scaling added past the value's own exponent
+    return Decimal(scaled // 10 ** (exponent + scale)).scaleb(exponent)
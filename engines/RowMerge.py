@@ -0,0 +1,70 @@
+"""
+engines.rowmerge
+~~~~~~~~~~~~~~
+
+This module contains methods to merge the decoded rows of many statements
+into a single date ordered history per fund.
+
+"""
+
+import heapq
+import re
+from itertools import islice
+from operator import attrgetter
+from typing import Sequence
+
+from models.TransactionRow import TransactionRow
+
+_get_date = attrgetter("date")
+
+# Registrars spell the same scheme with different case, spacing and dashes
+_SEPARATORS: re.Pattern = re.compile(r"[\W_]+")
+
+
+def normalize_fund_name(name: str) -> str:
+    """Reduce a fund name to its words, so spellings of a scheme compare equal"""
+    return " ".join(_SEPARATORS.sub(" ", name).split()).casefold()
+
+
+def merge_fund_rows(
+    sources: Sequence[dict[str, Sequence[TransactionRow]]],
+) -> dict[str, list[TransactionRow]]:
+    """Merge the rows of each fund across sources, keeping the first name seen.
+
+    Each source's rows of a fund are already in date order, so the sources
+    are merged in a single k-way pass rather than concatenated and sorted.
+    Rows on the same date keep the order of their sources. A fund found in
+    a single source keeps its rows as they are.
+    """
+    names: dict[str, str] = {}
+    fund_streams: dict[str, list[Sequence[TransactionRow]]] = {}
+
+    for source in sources:
+        for name, txn_rows in source.items():
+            key: str = normalize_fund_name(name)
+
+            if key not in fund_streams:
+                names[key] = name
+                fund_streams[key] = []
+
+            fund_streams[key].append(txn_rows)
+
+    txn_row_map: dict[str, list[TransactionRow]] = {}
+    for key, streams in fund_streams.items():
+        if len(streams) == 1:
+            txn_row_map[names[key]] = list(streams[0])
+            continue
+
+        txn_row_map[names[key]] = list(
+            heapq.merge(*(in_date_order(stream) for stream in streams), key=_get_date)
+        )
+
+    return txn_row_map
+
+
+def in_date_order(txn_rows: Sequence[TransactionRow]) -> Sequence[TransactionRow]:
+    """Return rows in date order, sorted stably only when they are not already"""
+    if all(a.date <= b.date for a, b in zip(txn_rows, islice(txn_rows, 1, None))):
+        return txn_rows
+
+    return sorted(txn_rows, key=_get_date)
@@ -10,10 +10,31 @@ Run python3 main.py --help for more information.
 import logging
 from argparse import ArgumentParser, ArgumentTypeError, Namespace, _SubParsersAction
 
-from services.CamsService import CamsService
-from services.KfintechService import KfintechService
-from services.ZerodhaService import ZerodhaService
+from services.ServiceRegistry import COMPANIES, get_service
 from utils import logger
+from utils.choices import CONSOLES, ENGINES, OUTPUT_FORMATS, POLICIES
+
+# Services, and the dependencies of only some runs, are imported once the
+# command is known, so that --help and small runs start quickly
+
+
+def positive_int(value: str) -> int:
+    """Parse a count of at least 1"""
+    number: int = int(value)
+    if number < 1:
+        raise ArgumentTypeError(f"must be at least 1, got {value}")
+
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    """Parse a count of at least 0"""
+    number: int = int(value)
+    if number < 0:
+        raise ArgumentTypeError(f"must be at least 0, got {value}")
+
+    return number
+
 
 parser = ArgumentParser(
     description="A Python script that processes transactions from different brokerages and repositories"
@@ -24,13 +45,156 @@ subparsers: _SubParsersAction = parser.add_subparsers(
     help="type of command to be executed",
 )
 
+# Options of every command that books a single history
+parser_booking: ArgumentParser = ArgumentParser(add_help=False)
+
+parser_booking.add_argument(
+    "-o",
+    "--output-filename",
+    metavar="FILENAME",
+    type=str,
+    help="output file name of transactions sheet",
+)
+
+parser_booking.add_argument(
+    "-f",
+    "--output-format",
+    choices=OUTPUT_FORMATS,
+    default="xlsx",
+    help="format of the output file, csv and jsonl stream fastest",
+)
+
+parser_booking.add_argument(
+    "-w",
+    "--workers",
+    metavar="N",
+    type=int,
+    default=1,
+    help="number of processes to book funds with, 0 to use all cores",
+)
+
+parser_booking.add_argument(
+    "-c",
+    "--checkpoint",
+    metavar="FILENAME",
+    type=str,
+    help="lot state file to resume from and update, booking only new rows",
+)
+
+parser_booking.add_argument(
+    "--profile",
+    dest="profile",
+    action="store_true",
+    help="print the time and memory spent in each stage",
+)
+
+parser_booking.add_argument(
+    "--profile-output",
+    metavar="FILENAME",
+    type=str,
+    help="JSON file to save the stage profile to, implies --profile",
+)
+
+parser_booking.add_argument(
+    "--profile-cprofile",
+    metavar="FILENAME",
+    type=str,
+    help="file to save cProfile stats of the slowest stage to, implies --profile",
+)
+
+parser_booking.add_argument(
+    "--metrics",
+    metavar="FILENAME",
+    type=str,
+    help="JSON file to save the row counts and booking time of each fund to",
+)
+
+parser_booking.add_argument(
+    "-p",
+    "--policy",
+    dest="policies",
+    nargs="+",
+    choices=POLICIES,
+    default=["fifo"],
+    help="lot-matching policies to book with, each written to its own output "
+    "file when several are given",
+)
+
+parser_booking.add_argument(
+    "-s",
+    "--summary",
+    dest="summary",
+    action="store_true",
+    help="write the realized and unrealized gains of each fund, summarized "
+    "while booking, to a _summary file next to the output file",
+)
+
+parser_booking.add_argument(
+    "--long-term-days",
+    metavar="DAYS",
+    type=non_negative_int,
+    help="days a lot is held past which its gain is long term, with --summary, "
+    "365 for funds and stocks by default",
+)
+
+parser_booking.add_argument(
+    "-e",
+    "--engine",
+    choices=ENGINES,
+    default="queue",
+    help="booking engine, columnar matches lots with NumPy (optional dependency)",
+)
+
+parser_booking.add_argument(
+    "--console",
+    choices=CONSOLES,
+    default="full",
+    help="how to print the transactions: a full table, its first and last "
+    "rows, fixed width rows as they are written, a per fund summary, or nothing",
+)
+
+parser_booking.add_argument(
+    "-n",
+    "--console-rows",
+    metavar="N",
+    type=positive_int,
+    default=10,
+    help="number of first and last rows to print with --console head-tail",
+)
+
+parser_booking.add_argument(
+    "--cache-dir",
+    metavar="DIRECTORY",
+    type=str,
+    help="directory to cache parsed statements in by their "
+    "content, so that a repeat run skips parsing",
+)
+
+parser_booking.add_argument(
+    "--cache-size",
+    metavar="MB",
+    type=int,
+    default=256,
+    help="megabytes of parsed statements to keep in --cache-dir",
+)
+
+parser_booking.add_argument(
+    "--verbose",
+    dest="verbose",
+    action="store_true",
+    help="verbose mode for detailed logging",
+)
+
+
 parser_process: ArgumentParser = subparsers.add_parser(
-    "process", help="process buy and sell transactions"
+    "process",
+    parents=[parser_booking],
+    help="process buy and sell transactions",
 )
 
 parser_process.add_argument(
     "company",
-    choices=["cams", "kfintech", "zerodha"],
+    choices=COMPANIES,
     help="name of brokerage or repository",
 )
 
@@ -40,41 +204,189 @@ parser_process.add_argument(
     metavar="FILENAME",
     type=str,
     required=True,
-    help="input file name of transactions sheet",
+    help="input file name of transactions sheet (xlsx, csv or row file)",
 )
 
 parser_process.add_argument(
-    "-o",
-    "--output-filename",
+    "--export-rows",
     metavar="FILENAME",
     type=str,
-    help="output file name of transactions sheet",
+    help="also write the decoded rows to a binary row file, which can be "
+    "given as the input file of a later run to skip decoding",
 )
 
-parser_process.add_argument(
+
+parser_consolidate: ArgumentParser = subparsers.add_parser(
+    "consolidate",
+    parents=[parser_booking],
+    help="process the statements of many registrars as a single history",
+)
+
+parser_consolidate.add_argument(
+    "-i",
+    "--input",
+    dest="inputs",
+    nargs=2,
+    action="append",
+    required=True,
+    metavar=("REGISTRAR", "FILENAME"),
+    help="name of registrar and its statement, given once per statement",
+)
+
+
+parser_batch: ArgumentParser = subparsers.add_parser(
+    "batch", help="process many statements concurrently"
+)
+
+parser_batch.add_argument(
+    "-g",
+    "--glob",
+    nargs=2,
+    action="append",
+    metavar=("COMPANY", "PATTERN"),
+    help="name of brokerage or repository and a glob of its statements",
+)
+
+parser_batch.add_argument(
+    "-m",
+    "--manifest",
+    metavar="FILENAME",
+    type=str,
+    help="csv file of company,input_filename[,output_filename] rows",
+)
+
+parser_batch.add_argument(
+    "-d",
+    "--output-dir",
+    metavar="DIRECTORY",
+    type=str,
+    default=".",
+    help="directory for per-input output files",
+)
+
+parser_batch.add_argument(
+    "--merge",
+    dest="merge_filename",
+    metavar="FILENAME",
+    type=str,
+    help="write all transactions to a single merged output file",
+)
+
+parser_batch.add_argument(
+    "-f",
+    "--output-format",
+    choices=OUTPUT_FORMATS,
+    default="xlsx",
+    help="format of the output files and the merged file",
+)
+
+parser_batch.add_argument(
+    "-w",
+    "--workers",
+    metavar="N",
+    type=int,
+    default=0,
+    help="number of statements to process at once, 0 to use all cores",
+)
+
+parser_batch.add_argument(
+    "--pipeline",
+    dest="pipeline",
+    action="store_true",
+    help="process statements one at a time, reading the next and writing the "
+    "previous while one books, booking their funds in one pool of --workers "
+    "processes",
+)
+
+parser_batch.add_argument(
+    "--queue-size",
+    metavar="N",
+    type=positive_int,
+    default=1,
+    help="number of statements to hold between stages with --pipeline",
+)
+
+parser_batch.add_argument(
+    "-e",
+    "--engine",
+    choices=ENGINES,
+    default="queue",
+    help="booking engine, columnar matches lots with NumPy (optional dependency)",
+)
+
+parser_batch.add_argument(
+    "--cache-dir",
+    metavar="DIRECTORY",
+    type=str,
+    help="directory to cache parsed statements in, shared by every job",
+)
+
+parser_batch.add_argument(
+    "--cache-size",
+    metavar="MB",
+    type=int,
+    default=256,
+    help="megabytes of parsed statements to keep in --cache-dir",
+)
+
+parser_batch.add_argument(
     "--verbose",
     dest="verbose",
     action="store_true",
     help="verbose mode for detailed logging",
 )
 
-args: Namespace = parser.parse_args()
 
-# Setup logging
-logger.setup_logging(args.verbose)
+def main():
+    args: Namespace = parser.parse_args()
+
+    # Setup logging
+    logger.setup_logging(args.verbose)
+
+    logging.debug(args)
+
+    command = args.command
+
+    # The holding period is only used to summarize gains
+    if getattr(args, "long_term_days", None) is not None and not args.summary:
+        parser.error("--long-term-days requires --summary")
+
+    # NumPy is an optional dependency, so its absence is reported as a usage
+    # error, found without importing it
+    if getattr(args, "engine", None) == "columnar":
+        from importlib.util import find_spec
+
+        if find_spec("numpy") is None:
+            parser.error(
+                "--engine columnar requires NumPy, install it with pip install numpy"
+            )
+
+    if command == "process":
+        get_service(args.company)(args).execute()
+    elif command == "consolidate":
+        from services.ConsolidatedService import REGISTRARS, ConsolidatedService
+
+        for registrar, _ in args.inputs:
+            if registrar not in REGISTRARS:
+                parser_consolidate.error(
+                    f"unsupported registrar '{registrar}', "
+                    f"choose from {', '.join(REGISTRARS)}"
+                )
+
+        ConsolidatedService(args).execute()
+    elif command == "batch":
+        if args.glob is None and args.manifest is None:
+            parser_batch.error("one of --glob or --manifest is required")
+
+        from services.BatchService import BatchService
 
-logging.debug(args)
+        BatchService(args).execute()
+    else:
+        raise ArgumentTypeError(
+            f"Unsupported command '{args.command}'. Run --help for more information."
+        )
 
-command = args.command
 
-if command == "process":
-    if args.company == "cams":
-        CamsService(args).execute()
-    elif args.company == "kfintech":
-        KfintechService(args).execute()
-    elif args.company == "zerodha":
-        ZerodhaService(args).execute()
-else:
-    raise ArgumentTypeError(
-        f"Unsupported command '{args.command}'. Run --help for more information."
-    )
+# Guarded so that worker processes started with "spawn" do not re-run the CLI
+if __name__ == "__main__":
+    main()
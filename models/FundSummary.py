@@ -0,0 +1,114 @@
+"""
+models.fundsummary
+~~~~~~~~~~~~~~
+
+This module contains a FundSummary model class.
+
+"""
+
+from decimal import Decimal
+from typing import Self
+
+
+class FundSummary:
+    """A class representing the realized and unrealized gains of a fund"""
+
+    HEADER: tuple[str, ...] = (
+        "Fund Name",
+        "Policy",
+        "Units Sold",
+        "Sale Value",
+        "Cost of Units Sold",
+        "Short Term Gain",
+        "Long Term Gain",
+        "Realized Gain",
+        "Units Held",
+        "Cost of Units Held",
+        "Last Price",
+        "Unrealized Gain",
+    )
+
+    __slots__ = (
+        "name",
+        "policy",
+        "sold_qty",
+        "sold_value",
+        "sold_cost",
+        "short_term_gain",
+        "long_term_gain",
+        "held_qty",
+        "held_cost",
+        "last_price",
+    )
+
+    name: str
+    policy: str
+    sold_qty: Decimal
+    sold_value: Decimal
+    sold_cost: Decimal
+    short_term_gain: Decimal
+    long_term_gain: Decimal
+    held_qty: Decimal
+    held_cost: Decimal
+    last_price: Decimal | None
+
+    def __init__(
+        self: Self,
+        name: str,
+        policy: str,
+        sold_qty: Decimal,
+        sold_value: Decimal,
+        sold_cost: Decimal,
+        short_term_gain: Decimal,
+        long_term_gain: Decimal,
+        held_qty: Decimal,
+        held_cost: Decimal,
+        last_price: Decimal | None,
+    ) -> None:
+        self.name = name
+        self.policy = policy
+        self.sold_qty = sold_qty
+        self.sold_value = sold_value
+        self.sold_cost = sold_cost
+        self.short_term_gain = short_term_gain
+        self.long_term_gain = long_term_gain
+        self.held_qty = held_qty
+        self.held_cost = held_cost
+        self.last_price = last_price
+
+    @property
+    def realized_gain(self: Self) -> Decimal:
+        return self.short_term_gain + self.long_term_gain
+
+    @property
+    def unrealized_gain(self: Self) -> Decimal | None:
+        """Gain of the units held if sold at the last price in the statement"""
+        if self.last_price is None:
+            return None
+
+        return self.held_qty * self.last_price - self.held_cost
+
+    def to_tuple(self: Self) -> tuple[str]:
+        """Convert the class to a list"""
+        unrealized_gain: Decimal | None = self.unrealized_gain
+
+        return (
+            self.name,
+            self.policy,
+            str(self.sold_qty),
+            str(self.sold_value),
+            str(self.sold_cost),
+            str(self.short_term_gain),
+            str(self.long_term_gain),
+            str(self.realized_gain),
+            str(self.held_qty),
+            str(self.held_cost),
+            str(self.last_price) if self.last_price is not None else "",
+            str(unrealized_gain) if unrealized_gain is not None else "",
+        )
+
+    def __str__(self):
+        attrs: str = ", ".join(
+            [f"{key}={getattr(self, key)}" for key in self.__slots__]
+        )
+        return "{" + attrs + "}"
@@ -16,10 +16,14 @@ from enums.TransactionType import TransactionType
 class TransactionRow:
     """A class representing a transaction row model"""
 
-    _buy_sell: TransactionType | None
-    _qty: Decimal
-    _date: datetime
-    _price: Decimal
+    # Slotted, so each row carries no per-instance __dict__ and attribute
+    # access skips the property call
+    __slots__ = ("buy_sell", "qty", "date", "price")
+
+    buy_sell: TransactionType | None
+    qty: Decimal
+    date: datetime
+    price: Decimal
 
     def __init__(
         self: Self,
@@ -28,31 +32,13 @@ class TransactionRow:
         price: Decimal,
         buy_sell: Optional[TransactionType] = None,
     ) -> None:
-        self._buy_sell = buy_sell
-        self._qty = qty
-        self._date = date
-        self._price = price
-
-    @property
-    def buy_sell(self: Self) -> TransactionType | None:
-        return self._buy_sell
-
-    @property
-    def qty(self: Self) -> Decimal:
-        return self._qty
-
-    @qty.setter
-    def qty(self: Self, qty: Decimal) -> Decimal:
-        self._qty = qty
-
-    @property
-    def date(self: Self) -> datetime:
-        return self._date
-
-    @property
-    def price(self: Self) -> Decimal:
-        return self._price
+        self.buy_sell = buy_sell
+        self.qty = qty
+        self.date = date
+        self.price = price
 
     def __repr__(self):
-        attrs: str = ", ".join([f"{key}={value}" for key, value in vars(self).items()])
+        attrs: str = ", ".join(
+            [f"{key}={getattr(self, key)}" for key in self.__slots__]
+        )
         return "{" + attrs + "}"
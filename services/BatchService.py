@@ -0,0 +1,290 @@
+"""
+services.batchservice
+~~~~~~~~~~~~~~
+
+This module contains a class to process many transaction statements at once
+
+"""
+
+import csv
+import glob
+import logging
+import os
+from argparse import Namespace
+from concurrent.futures import Executor
+from functools import partial
+from typing import Iterator, Self, Sequence
+
+from tabulate import tabulate
+
+from models.Transaction import Transaction
+from models.TransactionRow import TransactionRow
+from services.ServiceRegistry import COMPANIES, get_service
+from services.TransactionService import TransactionService
+from utils.files import write_transactions
+from utils.pipeline import run_pipeline
+from utils.pool import create_process_pool
+
+
+def _process_statement(job: Namespace) -> tuple[str, int, list[Transaction]]:
+    """Process a single statement, returning its sheet name, count and lots"""
+    return _write_statement(_book_statement(_load_statement(job)))
+
+
+def _load_statement(
+    job: Namespace, executor: Executor | None = None
+) -> tuple[Namespace, TransactionService, dict[str, Sequence[TransactionRow]]]:
+    # Strict, so that an unreadable statement fails its job rather than
+    # reporting no transactions
+    service: TransactionService = get_service(job.company)(
+        job, strict=True, executor=executor
+    )
+    return job, service, service.parse()
+
+
+def _book_statement(
+    loaded: tuple[Namespace, TransactionService, dict[str, Sequence[TransactionRow]]],
+) -> tuple[Namespace, TransactionService, list[Transaction]]:
+    job, service, txn_row_map = loaded
+    return job, service, service.book(txn_row_map)[job.policies[0]]
+
+
+def _write_statement(
+    booked: tuple[Namespace, TransactionService, list[Transaction]],
+) -> tuple[str, int, list[Transaction]]:
+    job, service, transactions = booked
+
+    # In merge mode the lots are written by the parent instead
+    if job.merge_filename is not None:
+        return service.get_sheet_name(), len(transactions), transactions
+
+    service.save(transactions)
+
+    return service.get_sheet_name(), len(transactions), []
+
+
+class BatchService:
+    """Class to process many statements concurrently"""
+
+    _args: Namespace
+    _jobs: list[Namespace]
+    _output_filenames: set[str]
+
+    def __init__(self: Self, args: Namespace) -> None:
+        self._args = args
+        self._output_filenames = set()
+        self._jobs = self._create_jobs()
+
+    def execute(self: Self):
+        if len(self._jobs) == 0:
+            logging.error("No input files matched")
+            return
+
+        logging.info("Processing %s statements", len(self._jobs))
+
+        if self._args.merge_filename is None:
+            os.makedirs(self._args.output_dir, exist_ok=True)
+
+        statuses: list[tuple] = []
+        merged_txns: list[Transaction] = []
+        sheet_names: set[str] = set()
+
+        results: Iterator[tuple[Namespace, tuple | Exception]] = (
+            self._run_pipeline() if self._args.pipeline else self._run_pool()
+        )
+
+        # Results arrive in job order so the report and merge are stable
+        for job, result in results:
+            if isinstance(result, Exception):
+                logging.error("Failed to process %s: %s", job.input_filename, result)
+                statuses.append(
+                    (job.input_filename, job.company, "FAILED", "", str(result))
+                )
+                continue
+
+            sheet_name, count, transactions = result
+            sheet_names.add(sheet_name)
+            merged_txns.extend(transactions)
+            statuses.append(
+                (
+                    job.input_filename,
+                    job.company,
+                    "OK",
+                    count,
+                    job.merge_filename or job.output_filename,
+                )
+            )
+
+        if self._args.merge_filename is not None:
+            self._save_merged(merged_txns, sheet_names)
+
+        print(
+            tabulate(
+                statuses,
+                headers=["Input", "Company", "Status", "Transactions", "Output"],
+            )
+        )
+
+    def _run_pool(self: Self) -> Iterator[tuple[Namespace, tuple | Exception]]:
+        """Process whole statements at once in a process pool"""
+        workers: int = self._args.workers if self._args.workers > 0 else None
+
+        with create_process_pool(workers) as executor:
+            futures = [executor.submit(_process_statement, job) for job in self._jobs]
+
+            for job, future in zip(self._jobs, futures):
+                try:
+                    yield job, future.result()
+                except Exception as e:
+                    yield job, e
+
+    def _run_pipeline(self: Self) -> Iterator[tuple[Namespace, tuple | Exception]]:
+        """Process statements one at a time, overlapping their stages.
+
+        The next statement is read and decoded while the current one books,
+        and the previous one is written meanwhile. Each statement books its
+        funds in a pool of the batch's workers, started once for them all.
+        """
+        workers: int = self._args.workers or os.cpu_count() or 1
+        if workers == 1:
+            yield from run_pipeline(
+                self._jobs,
+                (_load_statement, _book_statement, _write_statement),
+                self._args.queue_size,
+            )
+            return
+
+        with create_process_pool(workers) as executor:
+            yield from run_pipeline(
+                (Namespace(**{**vars(job), "workers": workers}) for job in self._jobs),
+                (
+                    partial(_load_statement, executor=executor),
+                    _book_statement,
+                    _write_statement,
+                ),
+                self._args.queue_size,
+            )
+
+    def _create_jobs(self: Self) -> list[Namespace]:
+        jobs: list[Namespace] = []
+
+        for company, pattern in self._args.glob or []:
+            company = company.lower()
+            if company not in COMPANIES:
+                logging.error("Unsupported company for glob: %s", company)
+                continue
+
+            input_filenames: list[str] = sorted(glob.glob(pattern))
+            if len(input_filenames) == 0:
+                logging.warning("No input files matched %s", pattern)
+
+            for input_filename in input_filenames:
+                jobs.append(self._create_job(company, input_filename))
+
+        if self._args.manifest is not None:
+            jobs.extend(self._read_manifest(self._args.manifest))
+
+        return jobs
+
+    def _read_manifest(self: Self, manifest: str) -> list[Namespace]:
+        """Read a CSV manifest of company,input_filename[,output_filename] rows"""
+        jobs: list[Namespace] = []
+        base_dir: str = os.path.dirname(manifest)
+
+        with open(manifest, newline="", encoding="utf-8") as file:
+            for row in csv.reader(file):
+                # Skip blank lines and comments
+                if len(row) == 0 or row[0].strip().startswith("#"):
+                    continue
+
+                company: str = row[0].strip().lower()
+                if company not in COMPANIES:
+                    logging.error("Unsupported company in manifest: %s", company)
+                    continue
+
+                input_filename: str = os.path.join(base_dir, row[1].strip())
+                output_filename: str | None = None
+                if len(row) > 2 and row[2].strip() != "":
+                    output_filename = os.path.join(base_dir, row[2].strip())
+
+                job: Namespace | None = self._create_job(
+                    company, input_filename, output_filename
+                )
+                if job is not None:
+                    jobs.append(job)
+
+        return jobs
+
+    def _create_job(
+        self: Self,
+        company: str,
+        input_filename: str,
+        output_filename: str | None = None,
+    ) -> Namespace | None:
+        if output_filename is None:
+            output_filename = self._get_output_filename(company, input_filename)
+        elif os.path.abspath(output_filename) in self._output_filenames:
+            # A second job would overwrite the output of the first
+            logging.error(
+                "Output file %s is already used by another input", output_filename
+            )
+            return None
+
+        self._output_filenames.add(os.path.abspath(output_filename))
+
+        # Each job carries every batch option, and books its funds serially
+        # without sharing a checkpoint or a profile with the other jobs, or
+        # printing its transactions or summarizing its gains
+        return Namespace(
+            **{
+                **vars(self._args),
+                "company": company,
+                "input_filename": input_filename,
+                "output_filename": output_filename,
+                "workers": 1,
+                "checkpoint": None,
+                "profile": False,
+                "profile_output": None,
+                "profile_cprofile": None,
+                "console": "none",
+                "console_rows": 0,
+                "policies": ["fifo"],
+                "summary": False,
+                "long_term_days": None,
+                "export_rows": None,
+                "metrics": None,
+            }
+        )
+
+    def _get_output_filename(self: Self, company: str, input_filename: str) -> str:
+        """Name the output file of an input, numbering it when the name is taken,
+        as inputs in other folders or with other extensions share a stem"""
+        stem: str = os.path.splitext(os.path.basename(input_filename))[0]
+        root: str = os.path.join(self._args.output_dir, f"{company}_{stem}")
+        extension: str = self._args.output_format
+
+        output_filename: str = f"{root}_output.{extension}"
+        count: int = 1
+        while os.path.abspath(output_filename) in self._output_filenames:
+            count += 1
+            output_filename = f"{root}_{count}_output.{extension}"
+
+        return output_filename
+
+    def _save_merged(
+        self: Self, transactions: list[Transaction], sheet_names: set[str]
+    ):
+        # Sort transactions based on date
+        sorted_txns: list[Transaction] = sorted(
+            transactions, key=lambda x: (x.buy_date, x.name)
+        )
+
+        sheet_name: str = sheet_names.pop() if len(sheet_names) == 1 else "Sheet1"
+
+        write_transactions(
+            sorted_txns,
+            TransactionService.HEADER,
+            self._args.merge_filename,
+            sheet_name,
+            self._args.output_format,
+        )
@@ -0,0 +1,101 @@
+"""
+services.consolidatedservice
+~~~~~~~~~~~~~~
+
+This module contains a class to process the CAMS and KFintech statements of
+an investor as a single history
+
+"""
+
+from argparse import Namespace
+from typing import IO, Iterable, Self, Sequence
+
+from engines.RowMerge import merge_fund_rows
+from enums.AssetType import AssetType
+from models.TransactionRow import TransactionRow
+from services.ServiceRegistry import get_service
+from services.TransactionService import TransactionService
+from utils.dates import get_timestamp
+
+# Registrars of mutual funds, whose statements hold the same kind of rows
+REGISTRARS: tuple[str, ...] = ("cams", "kfintech")
+
+
+class ConsolidatedService(TransactionService):
+    """Class to process the statements of many registrars as one"""
+
+    _sources: list[TransactionService]
+
+    def __init__(
+        self: Self,
+        args: Namespace | None = None,
+        inputs: Sequence[tuple[str, str | IO | Iterable[Sequence]]] = (),
+        **options,
+    ) -> None:
+        # Each input is a registrar with a path, an open file or rows
+        if args is not None:
+            options = {**self.get_options(args), **options}
+            inputs = inputs or args.inputs
+        options.pop("input_filename", None)
+
+        # No command reads the merged rows of many registrars back, as each
+        # registrar's service only reads its own layout
+        if options.get("export_rows_filename") is not None:
+            raise ValueError("Consolidated rows cannot be exported to a row file")
+
+        output_filename: str | None = options.pop("output_filename", None)
+        if output_filename is None:
+            output_filename: str = (
+                "consolidated_output_"
+                + get_timestamp()
+                + "."
+                + options.get("output_format", "xlsx")
+            )
+
+        # Each statement is read and decoded by its own registrar's service,
+        # which only parses, so it neither profiles nor writes anything
+        self._sources = [
+            get_service(company)(
+                **self.get_input_options(source),
+                output_filename=output_filename,
+                cache_dir=options.get("cache_dir"),
+                cache_size=options.get("cache_size", 256 << 20),
+                name_table=options.get("name_table"),
+                strict=options.get("strict", False),
+            )
+            for company, source in inputs
+        ]
+
+        # Rows are decoded by the sources, each in its own layout, so this
+        # service has neither a layout nor an input file of its own
+        super().__init__(
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            output_filename,
+            AssetType.MUTUAL_FUND,
+            **options,
+        )
+
+    def _parse_file(self: Self) -> dict[str : Sequence[TransactionRow]]:
+        # Sources are parsed as they would be on their own, each from its own
+        # cache or row file, and then merged by fund
+        txn_row_map: dict[str : list[TransactionRow]] = merge_fund_rows(
+            [source.parse() for source in self._sources]
+        )
+        self._read_failed = any(source._read_failed for source in self._sources)
+
+        return txn_row_map
+
+    def _describe_input(self: Self) -> str:
+        return ", ".join(source._describe_input() for source in self._sources)
+
+    def _get_parse_layout(self: Self) -> dict:
+        return {
+            "service": type(self).__name__,
+            "sources": [source._get_parse_layout() for source in self._sources],
+        }
@@ -24,10 +24,18 @@ class KfintechService(TransactionService):
     _PRICE_COL: int = 9
     _DATE_FORMAT: str = "%d-%b-%Y"
 
-    def __init__(self: Self, args: Namespace) -> None:
-        output_filename: str | None = args.output_filename
+    def __init__(self: Self, args: Namespace | None = None, **options) -> None:
+        if args is not None:
+            options = {**self.get_options(args), **options}
+
+        output_filename: str | None = options.pop("output_filename", None)
         if output_filename is None:
-            output_filename: str = "kfintech_output_" + get_timestamp() + ".xlsx"
+            output_filename: str = (
+                "kfintech_output_"
+                + get_timestamp()
+                + "."
+                + options.get("output_format", "xlsx")
+            )
 
         super().__init__(
             self._FIRST_ROW,
@@ -36,7 +44,8 @@ class KfintechService(TransactionService):
             self._QTY_COL,
             self._PRICE_COL,
             self._DATE_FORMAT,
-            args.input_filename,
+            options.pop("input_filename", None),
             output_filename,
             AssetType.MUTUAL_FUND,
+            **options,
         )
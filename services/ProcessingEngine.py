@@ -0,0 +1,142 @@
+"""
+services.processingengine
+~~~~~~~~~~~~~~
+
+This module contains a class to process statements from within another
+program, reading them from paths, open files or rows held in memory, and
+returning their transactions rather than writing them.
+
+"""
+
+from typing import IO, Iterable, Iterator, Self, Sequence
+
+from models.FundSummary import FundSummary
+from models.Transaction import Transaction
+from services.ServiceRegistry import get_service
+from services.TransactionService import TransactionService
+from utils.choices import ENGINES, POLICIES, check_choice
+
+
+class ProcessingEngine:
+    """Reusable engine processing the statements of any company.
+
+    An engine holds only its options, and a table of fund names if asked to
+    share them, so one engine can process many statements, from many threads
+    at once. Each statement gets a service of its own, which holds the state
+    of that run and raises when its statement cannot be read. Parsed dates
+    are cached for the whole process, in a bounded cache, so they stay warm
+    from one statement to the next.
+
+    With share_names, the transactions of every statement share one string
+    per fund name. The table keeps every name it sees for the life of the
+    engine, so it suits a known set of funds, such as a registrar's schemes.
+    """
+
+    _options: dict
+    _name_table: dict[str, str] | None
+
+    def __init__(
+        self: Self,
+        policies: Sequence[str] = ("fifo",),
+        summary: bool = False,
+        long_term_days: int | None = None,
+        engine: str = "queue",
+        workers: int = 1,
+        cache_dir: str | None = None,
+        cache_size: int = 256 << 20,
+        share_names: bool = False,
+    ) -> None:
+        # Options are checked here, as argparse checks them for the command
+        # line, rather than when the first statement is processed
+        if len(policies) == 0:
+            raise ValueError("At least one policy is required")
+        for policy in policies:
+            check_choice("policy", policy, POLICIES)
+        check_choice("engine", engine, ENGINES)
+        if long_term_days is not None and long_term_days < 0:
+            raise ValueError(f"long_term_days must be at least 0, got {long_term_days}")
+        if workers < 0:
+            raise ValueError(f"workers must be at least 0, got {workers}")
+
+        # A statement is booked in the calling thread unless workers are asked
+        # for, as a long-running program may not want processes started. The
+        # workers import the program's main module, which must be guarded
+        self._options = {
+            "policies": tuple(policies),
+            "summary": summary,
+            "long_term_days": long_term_days,
+            "engine": engine,
+            "workers": workers,
+            "cache_dir": cache_dir,
+            "cache_size": cache_size,
+            "console": "none",
+            "strict": True,
+        }
+        self._name_table = {} if share_names else None
+
+    def create_service(
+        self: Self, company: str, source: str | IO | Iterable[Sequence]
+    ) -> TransactionService:
+        """Create a service reading a statement from a path, an open file, or
+        rows laid out like the statement, leading rows included"""
+        return get_service(company)(
+            **TransactionService.get_input_options(source),
+            **self._options,
+            name_table=self._name_table,
+        )
+
+    def create_consolidated_service(
+        self: Self, inputs: Sequence[tuple[str, str | IO | Iterable[Sequence]]]
+    ) -> TransactionService:
+        """Create a service reading the statements of many registrars as one"""
+        from services.ConsolidatedService import ConsolidatedService
+
+        return ConsolidatedService(
+            inputs=inputs, **self._options, name_table=self._name_table
+        )
+
+    def process(
+        self: Self,
+        company: str,
+        source: str | IO | Iterable[Sequence],
+        policy: str | None = None,
+    ) -> list[Transaction]:
+        """Read, book and sort the transactions of a statement under a policy"""
+        return self.process_policies(company, source)[
+            policy or self._options["policies"][0]
+        ]
+
+    def process_policies(
+        self: Self, company: str, source: str | IO | Iterable[Sequence]
+    ) -> dict[str, list[Transaction]]:
+        """Read a statement once, and book and sort it under every policy"""
+        return self.create_service(company, source).process_policies()
+
+    def iter_transactions(
+        self: Self,
+        company: str,
+        source: str | IO | Iterable[Sequence],
+        policy: str | None = None,
+    ) -> Iterator[Transaction]:
+        """Lazily yields the transactions of a statement, in date order.
+
+        Transactions are sorted across funds, so the statement is processed
+        when the first one is asked for.
+        """
+        yield from self.process(company, source, policy)
+
+    def summarize(
+        self: Self,
+        company: str,
+        source: str | IO | Iterable[Sequence],
+        policy: str | None = None,
+    ) -> list[FundSummary]:
+        """Return the gains of each fund of a statement, summarized while booking"""
+        service: TransactionService = get_service(company)(
+            **TransactionService.get_input_options(source),
+            **{**self._options, "summary": True},
+            name_table=self._name_table,
+        )
+        service.process_policies()
+
+        return service.get_summaries(policy)
@@ -0,0 +1,29 @@
+"""
+services.serviceregistry
+~~~~~~~~~~~~~~
+
+This module contains the services of every brokerage and repository, each
+imported only once it is asked for.
+
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from services.TransactionService import TransactionService
+
+# Module of each company's service, named after its class
+_SERVICE_MODULES: dict[str, str] = {
+    "cams": "CamsService",
+    "kfintech": "KfintechService",
+    "zerodha": "ZerodhaService",
+}
+
+COMPANIES: tuple[str, ...] = tuple(_SERVICE_MODULES)
+
+
+def get_service(company: str) -> type["TransactionService"]:
+    """Import and return the service class of a company"""
+    name: str = _SERVICE_MODULES[company]
+    return getattr(import_module("services." + name), name)
@@ -1,42 +1,123 @@
+import heapq
+import json
 import logging
+import os
+import time
+from argparse import Namespace
+from concurrent.futures import Executor
 from decimal import Decimal
-from typing import Self
-
-from tabulate import tabulate
-
+from operator import itemgetter
+from typing import IO, Callable, Iterable, Iterator, Self, Sequence
+
+from engines.LotCheckpoint import hash_rows, load_checkpoint, save_checkpoint
+from engines.LotQueue import LotQueue
+from engines.ParseCache import cache_key, load_rows, save_rows
+from engines.RowFile import RowFile, is_row_file, write_row_file
+from engines.RowMerge import in_date_order
 from enums.AssetType import AssetType
 from enums.TransactionType import TransactionType
+from models.FundSummary import FundSummary
 from models.Transaction import Transaction
 from models.TransactionRow import TransactionRow
+from utils.choices import CONSOLES, ENGINES, OUTPUT_FORMATS, POLICIES, check_choice
 from utils.dates import to_datetime
-from utils.files import read_excel_to_list, write_list_to_excel
+from utils.console import print_head_tail, print_stream, print_summary, print_table
+from utils.files import iter_rows, iter_sequence_rows, write_rows, write_transactions
+from utils.profiler import Profiler
 
 
 class TransactionService:
     """Class to process transactions with implementation"""
 
-    _first_row: int
-    _name_col: int
-    _date_col: int
-    _qty_col: int
-    _price_col: int
-    _date_format: str
-    _input_filename: str
+    HEADER: tuple[str, ...] = (
+        "Fund Name",
+        "Buy/Sell",
+        "Units",
+        "Buy Date",
+        "Buy Price",
+        "Sell Date",
+        "Sell Price",
+    )
+
+    # Days a lot is held past which its gain is long term, by default, for
+    # each type of asset. Listed shares and equity oriented funds are long
+    # term after 12 months, and other holding periods are given with
+    # --long-term-days
+    LONG_TERM_DAYS: dict[AssetType, int] = {
+        AssetType.MUTUAL_FUND: 365,
+        AssetType.STOCK: 365,
+    }
+
+    # The layout of the rows decoded, which a service merging the rows of
+    # other services does not have
+    _first_row: int | None
+    _name_col: int | None
+    _date_col: int | None
+    _qty_col: int | None
+    _price_col: int | None
+    _date_format: str | None
+    _input_filename: str | IO | None
+    _input_rows: Iterable[Sequence] | None
     _output_filename: str
     _asset_type: AssetType
+    _workers: int
+    _executor: Executor | None
+    _checkpoint_filename: str | None
+    _profiler: Profiler
+    _engine: str
+    _console: str
+    _console_rows: int
+    _output_format: str
+    _policies: tuple[str, ...]
+    _long_term_days: int | None
+    _summaries: dict[str, list[FundSummary]]
+    _cache_dir: str | None
+    _cache_size: int
+    _export_rows_filename: str | None
+    _metrics_filename: str | None
+    _metrics: dict
+    _name_table: dict[str, str] | None
+    _strict: bool
+    _read_failed: bool
 
     def __init__(
         self: Self,
-        first_row: int,
-        name_col: int,
-        date_col: int,
-        qty_col: int,
-        price_col: int,
-        date_format: str,
-        input_filename: str,
+        first_row: int | None,
+        name_col: int | None,
+        date_col: int | None,
+        qty_col: int | None,
+        price_col: int | None,
+        date_format: str | None,
+        input_filename: str | IO | None,
         output_filename: str,
         asset_type: AssetType,
+        input_rows: Iterable[Sequence] | None = None,
+        workers: int = 1,
+        executor: Executor | None = None,
+        checkpoint_filename: str | None = None,
+        profiler: Profiler | None = None,
+        engine: str = "queue",
+        console: str = "full",
+        console_rows: int = 10,
+        output_format: str = "xlsx",
+        policies: Sequence[str] = ("fifo",),
+        summary: bool = False,
+        long_term_days: int | None = None,
+        cache_dir: str | None = None,
+        cache_size: int = 256 << 20,
+        export_rows_filename: str | None = None,
+        metrics_filename: str | None = None,
+        name_table: dict[str, str] | None = None,
+        strict: bool = False,
     ) -> None:
+        if len(policies) == 0:
+            raise ValueError("At least one policy is required")
+        for policy in policies:
+            check_choice("policy", policy, POLICIES)
+        check_choice("engine", engine, ENGINES)
+        check_choice("console", console, CONSOLES)
+        check_choice("output format", output_format, OUTPUT_FORMATS)
+
         self._first_row = first_row
         self._name_col = name_col
         self._date_col = date_col
@@ -44,96 +125,634 @@ class TransactionService:
         self._price_col = price_col
         self._date_format = date_format
         self._input_filename = input_filename
+        self._input_rows = input_rows
         self._output_filename = output_filename
         self._asset_type = asset_type
+        self._workers = workers
+        # A pool shared by many statements books funds instead of a pool of
+        # their own, which would be started for each statement
+        self._executor = executor
+        self._checkpoint_filename = checkpoint_filename
+        self._profiler = profiler if profiler is not None else Profiler()
+        self._engine = engine
+        self._console = console
+        self._console_rows = console_rows
+        self._output_format = output_format
+        self._policies = tuple(policies)
+        # Gains are only summarized while booking when a summary is asked for
+        self._long_term_days = None
+        if summary:
+            self._long_term_days = (
+                long_term_days
+                if long_term_days is not None
+                else self.LONG_TERM_DAYS[asset_type]
+            )
+        self._summaries = {}
+        self._cache_dir = cache_dir
+        self._cache_size = cache_size
+        self._export_rows_filename = export_rows_filename
+        self._metrics_filename = metrics_filename
+        self._metrics = {}
+        self._name_table = name_table
+        # A strict service raises when its input cannot be read, where the
+        # command line logs the error and carries on with no rows
+        self._strict = strict
+        self._read_failed = False
+
+        # NumPy is optional, so a missing install is reported before any work
+        if self._engine == "columnar":
+            try:
+                import engines.ColumnarBooking  # noqa: F401
+            except ImportError as e:
+                raise ImportError(
+                    "The columnar engine requires NumPy, install it with "
+                    "pip install numpy"
+                ) from e
+
+    def __getstate__(self: Self) -> dict:
+        # Workers only book, so an open input file, rows and names held in
+        # memory, or the pool itself, are not sent to them
+        return {
+            **self.__dict__,
+            "_input_filename": None,
+            "_input_rows": None,
+            "_name_table": None,
+            "_executor": None,
+        }
+
+    @staticmethod
+    def get_options(args: Namespace) -> dict:
+        """Map the options of the process command to keyword arguments"""
+        return {
+            # The consolidate command names its inputs otherwise
+            "input_filename": getattr(args, "input_filename", None),
+            "output_filename": args.output_filename,
+            "workers": args.workers,
+            "checkpoint_filename": args.checkpoint,
+            "profiler": Profiler(
+                args.profile, args.profile_output, args.profile_cprofile
+            ),
+            "engine": args.engine,
+            "console": args.console,
+            "console_rows": args.console_rows,
+            "output_format": args.output_format,
+            "policies": args.policies,
+            "summary": args.summary,
+            "long_term_days": args.long_term_days,
+            "cache_dir": args.cache_dir,
+            "cache_size": args.cache_size << 20,
+            # Only the process command exports rows
+            "export_rows_filename": getattr(args, "export_rows", None),
+            "metrics_filename": args.metrics,
+        }
+
+    @staticmethod
+    def get_input_options(source: str | IO | Iterable[Sequence]) -> dict:
+        """Map a path, an open file or in-memory rows to keyword arguments"""
+        if isinstance(source, str) or hasattr(source, "read"):
+            return {"input_filename": source}
+
+        return {"input_filename": None, "input_rows": source}
 
     def execute(self: Self):
-        txn_rows: list = self._read_file()
+        policy_txns: dict[str, list[Transaction]] = self.process_policies()
 
-        txn_row_map: dict[str : list[TransactionRow]] = self._create_txn_row_map(
-            txn_rows
-        )
+        for policy, sorted_txns in policy_txns.items():
+            if len(policy_txns) > 1:
+                logging.info("Transactions matched by %s", policy)
+
+            # Print the transactions
+            with self._profiler.stage("print"):
+                self._print_list(sorted_txns)
+
+            # Save to the output file
+            with self._profiler.stage("save"):
+                self.save(sorted_txns, self._get_output_filename(policy))
+
+                if self._long_term_days is not None:
+                    self.save_summary(policy)
+
+        if self._metrics_filename is not None:
+            self.save_metrics()
+
+        self._profiler.report()
+
+    def process(self: Self) -> list[Transaction]:
+        """Read, book and sort the transactions of the input file"""
+        return self.process_policies()[self._policies[0]]
+
+    def process_policies(self: Self) -> dict[str, list[Transaction]]:
+        """Read the input file once, and book and sort it under every policy"""
+        return self.book(self.parse())
+
+    def parse(self: Self) -> dict[str : Sequence[TransactionRow]]:
+        """Read and decode the input file into the rows of each fund"""
+        start: float = time.perf_counter()
+
+        # Rows are read lazily, so reading is measured as part of parsing
+        self._read_failed = False
+        with self._profiler.stage("parse"):
+            txn_row_map: dict[str : Sequence[TransactionRow]] = self._parse_file()
+
+        self._metrics["parse_seconds"] = time.perf_counter() - start
+
+        return txn_row_map
+
+    def book(
+        self: Self, txn_row_map: dict[str : Sequence[TransactionRow]]
+    ) -> dict[str, list[Transaction]]:
+        """Book and sort the rows of each fund under every policy"""
+        start: float = time.perf_counter()
 
         # Create transactions
-        final_txns: list[Transaction] = []
-        for name, txn_rows in txn_row_map.items():
-            # Segregate into buy/sell transactions
-            buy_txns: list[TransactionRow] = self._get_buy_txns(txn_rows)
-            sell_txns: list[TransactionRow] = self._get_sell_txns(txn_rows)
+        with self._profiler.stage("book"):
+            policy_txns: dict[str, list[Transaction]] = self._book_funds(txn_row_map)
 
-            final_txns.extend(self._process_transactions(name, buy_txns, sell_txns))
+        self._metrics["book_seconds"] = time.perf_counter() - start
 
         # Sort transactions based on date
-        sorted_txns: list[Transaction] = sorted(
-            final_txns, key=lambda x: (x.buy_date, x.name)
+        with self._profiler.stage("sort"):
+            return {
+                policy: sorted(final_txns, key=lambda x: (x.buy_date, x.name))
+                for policy, final_txns in policy_txns.items()
+            }
+
+    def save(
+        self: Self,
+        transactions: Iterable[Transaction],
+        output_filename: str | None = None,
+    ):
+        """Write the transactions to the output file"""
+        # Get sheet name
+        sheet_name: str = self.get_sheet_name()
+
+        # Stream to the output format
+        write_transactions(
+            transactions,
+            self.HEADER,
+            output_filename or self._output_filename,
+            sheet_name,
+            self._output_format,
         )
 
-        # Create a list and print it
-        tuple_list: list[tuple] = self._create_list(sorted_txns)
+    def get_summaries(self: Self, policy: str | None = None) -> list[FundSummary]:
+        """Return the gains of each fund summarized by the last booking"""
+        return self._summaries.get(policy or self._policies[0], [])
 
-        # Get sheet name
-        sheet_name: str = self._get_sheet_name()
+    def save_summary(self: Self, policy: str | None = None):
+        """Write the gains of each fund to the summary file of a policy"""
+        root, extension = os.path.splitext(
+            self._get_output_filename(policy or self._policies[0])
+        )
+
+        write_rows(
+            (summary.to_tuple() for summary in self.get_summaries(policy)),
+            FundSummary.HEADER,
+            f"{root}_summary{extension}",
+            "Summary",
+            self._output_format,
+        )
+
+    def save_metrics(self: Self, metrics_filename: str | None = None):
+        """Write the counts and timings of the last run, and of each fund, as JSON"""
+        metrics_filename = metrics_filename or self._metrics_filename
+
+        try:
+            with open(metrics_filename, "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        "service": type(self).__name__,
+                        "input_filename": self._describe_input(),
+                        "policies": list(self._policies),
+                        "parse_seconds": self._metrics.get("parse_seconds"),
+                        "book_seconds": self._metrics.get("book_seconds"),
+                        "rows": self._metrics.get("rows"),
+                        "funds": self._metrics.get("funds", []),
+                    },
+                    file,
+                    indent=2,
+                )
+
+            logging.info("Saved metrics to %s", metrics_filename)
+        except Exception as e:
+            logging.error("An error occurred: %s", e)
+
+    def _describe_input(self: Self) -> str:
+        if self._input_rows is not None:
+            return "<rows>"
+        if isinstance(self._input_filename, str):
+            return self._input_filename
+
+        # An open file is described by its name, when it has one
+        return str(getattr(self._input_filename, "name", "<file>"))
+
+    def _parse_file(self: Self) -> dict[str : Sequence[TransactionRow]]:
+        # A row file holds decoded rows, which are read from the mapped file
+        # as each fund is booked, in whichever process books it
+        if isinstance(self._input_filename, str) and is_row_file(self._input_filename):
+            return self._open_row_file()
+
+        txn_row_map: dict[str : list[TransactionRow]] = self._decode_file()
+
+        self._export_rows(txn_row_map)
+
+        return txn_row_map
+
+    def _open_row_file(self: Self) -> dict[str : Sequence[TransactionRow]]:
+        try:
+            row_file: RowFile = RowFile(self._input_filename)
+
+            # Rows of another layout would be misread, such as sells taken
+            # for buys where the sides are not given
+            if row_file.layout != json.loads(json.dumps(self._get_parse_layout())):
+                raise ValueError(
+                    f"Row file {self._input_filename} was written by "
+                    f"{row_file.layout.get('service')}, not {type(self).__name__}"
+                )
+        except Exception as e:
+            logging.error("An error occurred: %s", e)
+            self._read_failed = True
+            if self._strict:
+                raise
+
+            return {}
+
+        return row_file.funds()
+
+    def _export_rows(self: Self, txn_row_map: dict[str : Sequence[TransactionRow]]):
+        if self._export_rows_filename is None:
+            return
+
+        try:
+            write_row_file(
+                self._export_rows_filename, txn_row_map, self._get_parse_layout()
+            )
+        except Exception as e:
+            logging.error("An error occurred: %s", e)
+
+    def _decode_file(self: Self) -> dict[str : list[TransactionRow]]:
+        # Only a file on disk can be hashed again by the next run
+        if self._cache_dir is None or not isinstance(self._input_filename, str):
+            return self._create_txn_row_map(self._read_file())
+
+        # A changed file or layout hashes to another key, so it misses
+        try:
+            key: str = cache_key(self._input_filename, self._get_parse_layout())
+        except OSError:
+            # Read uncached, so the reader reports the missing file
+            return self._create_txn_row_map(self._read_file())
+
+        txn_row_map: dict[str : list[TransactionRow]] | None = load_rows(
+            self._cache_dir, key
+        )
+        if txn_row_map is None:
+            txn_row_map = self._create_txn_row_map(self._read_file())
+
+            # Rows of a failed read would be taken for the whole statement
+            if not self._read_failed:
+                save_rows(self._cache_dir, key, txn_row_map, self._cache_size)
+
+        return txn_row_map
+
+    def _read_file(self: Self) -> Iterator[list | tuple]:
+        # Only the range of columns the decoder uses is read
+        columns: tuple[int, ...] = self._get_columns()
+
+        if self._input_rows is not None:
+            return iter_sequence_rows(
+                self._input_rows, self._first_row, min(columns), max(columns) + 1
+            )
+
+        return self._check_read(
+            iter_rows(
+                self._input_filename,
+                self._first_row,
+                min(columns),
+                max(columns) + 1,
+                raise_errors=True,
+            )
+        )
+
+    def _check_read(self: Self, rows: Iterator[list | tuple]) -> Iterator[list | tuple]:
+        # The reader logs its error, and the rows read before it are kept
+        # unless strict, but the read is marked failed so they are not saved
+        # as if they were the whole statement
+        try:
+            yield from rows
+        except Exception:
+            self._read_failed = True
+            if self._strict:
+                raise
+
+    def _get_columns(self: Self) -> tuple[int, ...]:
+        """Columns of the input that are decoded, in decoding order"""
+        return (self._name_col, self._date_col, self._qty_col, self._price_col)
+
+    def _compile_decoder(
+        self: Self,
+    ) -> Callable[[Sequence], tuple[str, TransactionRow] | None]:
+        """Build a function decoding a row read by _read_file, or None to skip it"""
+        first_col: int = min(self._get_columns())
+        get_cells: itemgetter = itemgetter(
+            *(
+                col - first_col
+                for col in (
+                    self._name_col,
+                    self._date_col,
+                    self._qty_col,
+                    self._price_col,
+                )
+            )
+        )
+        date_format: str = self._date_format
+        decode_side: Callable[[Sequence], TransactionType] | None = (
+            self._compile_side_decoder()
+        )
+
+        def decode(row: Sequence) -> tuple[str, TransactionRow] | None:
+            name, date, qty, price = get_cells(row)
+
+            # Skip blank and zero quantities before converting anything
+            if not qty or qty == "0":
+                return None
 
-        # Save to excel
-        write_list_to_excel(tuple_list, self._output_filename, sheet_name)
+            # Compare as a Decimal so text cells such as "0.00" are skipped too
+            qty = Decimal(str(qty))
+            if qty == 0:
+                return None
 
-    def _read_file(self: Self):
-        return read_excel_to_list(self._input_filename)
+            return name.strip(), TransactionRow(
+                qty=qty,
+                date=to_datetime(date, date_format),
+                price=Decimal(str(price)),
+                buy_sell=decode_side(row) if decode_side is not None else None,
+            )
+
+        return decode
+
+    def _compile_side_decoder(
+        self: Self,
+    ) -> Callable[[Sequence], TransactionType] | None:
+        """Build a function decoding the side of a row read by _read_file, or
+        None where the input gives no sides and the quantity's sign is used"""
+        return None
 
     def _create_txn_row_map(
-        self: Self, txn_rows: list[TransactionRow]
+        self: Self, txn_rows: Iterable[list | tuple]
     ) -> dict[str : list[TransactionRow]]:
         txn_row_map: dict[str : list[TransactionRow]] = {}
+        decode: Callable[[Sequence], tuple[str, TransactionRow] | None] = (
+            self._compile_decoder()
+        )
+        name_table: dict[str, str] | None = self._name_table
 
-        for txn in txn_rows[self._first_row :]:
-            if txn[self._qty_col] is None or txn[self._qty_col] == 0:
+        for txn in txn_rows:
+            decoded: tuple[str, TransactionRow] | None = decode(txn)
+            if decoded is None:
                 continue
 
-            name: str = txn[self._name_col].strip()
-
-            txn_row = TransactionRow(
-                qty=Decimal(str(txn[self._qty_col])),
-                date=to_datetime(txn[self._date_col], self._date_format),
-                price=Decimal(str(txn[self._price_col])),
-            )
+            name, txn_row = decoded
 
             if name in txn_row_map:
                 txn_row_map[name].append(txn_row)
             else:
+                # Statements sharing a name table share its fund names, so
+                # their transactions do not each hold a copy
+                if name_table is not None:
+                    name = name_table.setdefault(name, name)
+
                 txn_row_map[name] = [txn_row]
 
         return txn_row_map
 
+    def _book_funds(
+        self: Self, txn_row_map: dict[str : list[TransactionRow]]
+    ) -> dict[str, list[Transaction]]:
+        # Attach each fund's checkpoint, so that only it is sent to a worker
+        checkpoint: dict[str, dict] = {}
+        if self._checkpoint_filename is not None:
+            checkpoint = load_checkpoint(self._checkpoint_filename, self._get_layout())
+
+        funds: Iterator[tuple[str, list[TransactionRow], dict | None]] = (
+            (name, txn_rows, checkpoint.get(name))
+            for name, txn_rows in txn_row_map.items()
+        )
+
+        workers: int = self._workers if self._workers > 0 else os.cpu_count() or 1
+
+        # Shard funds across a process pool, handing them off in chunks so
+        # that many small funds do not cost one round-trip each
+        chunksize: int = max(1, len(txn_row_map) // (workers * 4))
+
+        if self._executor is not None and len(txn_row_map) > 1:
+            return self._merge_funds(
+                self._executor.map(self._book_fund, funds, chunksize=chunksize),
+                checkpoint,
+            )
+
+        if workers > 1 and len(txn_row_map) > 1:
+            # Imported here, as multiprocessing is slow to import for a run
+            # that books in a single process
+            from utils.pool import create_process_pool
+
+            with create_process_pool(workers) as executor:
+                return self._merge_funds(
+                    executor.map(self._book_fund, funds, chunksize=chunksize),
+                    checkpoint,
+                )
+
+        return self._merge_funds(map(self._book_fund, funds), checkpoint)
+
+    def _book_fund(
+        self: Self, fund: tuple[str, list[TransactionRow], dict | None]
+    ) -> tuple[
+        str,
+        dict[str, list[Transaction]],
+        dict[str, FundSummary] | None,
+        dict | None,
+        dict,
+    ]:
+        name, txn_rows, fund_checkpoint = fund
+
+        # Segregate into buy/sell transactions
+        buy_txns, sell_txns = self._segregate_txns(txn_rows)
+
+        # The parsed and segregated rows are booked under every policy
+        policy_txns: dict[str, list[Transaction]] = {}
+        summaries: dict[str, FundSummary] = {}
+        lot_states: dict[str, dict] = {}
+        policy_metrics: dict[str, dict] = {}
+        for policy in self._policies:
+            start: float = time.perf_counter()
+
+            lot_queue: LotQueue = self._restore_lot_queue(
+                name, policy, buy_txns, sell_txns, fund_checkpoint
+            )
+
+            policy_txns[policy] = self._process_transactions(
+                name, buy_txns, sell_txns, lot_queue
+            )
+
+            policy_metrics[policy] = {
+                "transactions": len(policy_txns[policy]),
+                "seconds": time.perf_counter() - start,
+            }
+
+            if self._long_term_days is not None:
+                summaries[policy] = lot_queue.summary()
+
+            if self._checkpoint_filename is not None:
+                lot_states[policy] = lot_queue.to_state()
+
+        if self._long_term_days is None:
+            summaries = None
+
+        metrics: dict = {
+            "name": name,
+            "rows": len(txn_rows),
+            "buys": len(buy_txns),
+            "sells": len(sell_txns),
+            "policies": policy_metrics,
+        }
+
+        if self._checkpoint_filename is None:
+            return name, policy_txns, summaries, None, metrics
+
+        return (
+            name,
+            policy_txns,
+            summaries,
+            {
+                "buy_hash": hash_rows(buy_txns),
+                "sell_hash": hash_rows(sell_txns),
+                "lots": lot_states,
+            },
+            metrics,
+        )
+
+    def _restore_lot_queue(
+        self: Self,
+        name: str,
+        policy: str,
+        buy_txns: list[TransactionRow],
+        sell_txns: list[TransactionRow],
+        fund_checkpoint: dict | None,
+    ) -> LotQueue:
+        if fund_checkpoint is None or policy not in fund_checkpoint["lots"]:
+            return LotQueue(name, policy, self._long_term_days)
+
+        lot_queue: LotQueue = LotQueue.from_state(
+            name, fund_checkpoint["lots"][policy], self._long_term_days
+        )
+
+        # The checkpoint only holds if the rows it booked are still the first
+        # rows of the fund, and no sell was left unfilled that a newly added
+        # buy would have absorbed
+        if (
+            lot_queue.unfilled_qty == 0
+            and lot_queue.buy_count <= len(buy_txns)
+            and lot_queue.sell_count <= len(sell_txns)
+            and hash_rows(buy_txns[: lot_queue.buy_count])
+            == fund_checkpoint["buy_hash"]
+            and hash_rows(sell_txns[: lot_queue.sell_count])
+            == fund_checkpoint["sell_hash"]
+        ):
+            logging.debug("Resuming %s %s from checkpoint", name, policy)
+            return lot_queue
+
+        logging.info("History of %s changed, booking all rows", name)
+        return LotQueue(name, policy, self._long_term_days)
+
+    def _merge_funds(
+        self: Self,
+        results: Iterable[
+            tuple[
+                str,
+                dict[str, list[Transaction]],
+                dict[str, FundSummary] | None,
+                dict | None,
+                dict,
+            ]
+        ],
+        checkpoint: dict[str, dict],
+    ) -> dict[str, list[Transaction]]:
+        # Results arrive in fund order, so the merge is deterministic. Funds
+        # missing from this statement keep their entries in the checkpoint
+        policy_txns: dict[str, list[Transaction]] = {
+            policy: [] for policy in self._policies
+        }
+        self._summaries = {policy: [] for policy in self._policies}
+        fund_metrics: list[dict] = []
+        for name, fund_txns, fund_summaries, fund_checkpoint, metrics in results:
+            for policy, txns in fund_txns.items():
+                policy_txns[policy].extend(txns)
+            for policy, summary in (fund_summaries or {}).items():
+                self._summaries[policy].append(summary)
+            checkpoint[name] = fund_checkpoint
+            fund_metrics.append(metrics)
+
+        # One line for the run, where there used to be one per fund
+        logging.info("Booked %s funds", len(fund_metrics))
+
+        self._metrics["rows"] = sum(metrics["rows"] for metrics in fund_metrics)
+        self._metrics["funds"] = fund_metrics
+
+        # A failed read would replace the checkpoint with the funds read so far
+        if self._checkpoint_filename is not None and not self._read_failed:
+            save_checkpoint(self._checkpoint_filename, self._get_layout(), checkpoint)
+
+        return policy_txns
+
     def _process_transactions(
         self: Self,
         name: str,
         buy_txns: list[TransactionRow],
         sell_txns: list[TransactionRow],
+        lot_queue: LotQueue | None = None,
     ):
-        logging.info("Processing transactions for %s", name)
-
-        final_txns: list[Transaction] = []
-
-        # Adding all buy transactions
-        for buy_txn in buy_txns:
-            final_txns.append(
-                Transaction(
-                    name=name,
-                    buy_sell=TransactionType.BUY,
-                    qty=buy_txn.qty,
-                    buy_date=buy_txn.date,
-                    buy_price=buy_txn.price,
-                )
+        logging.debug("Processing transactions for %s", name)
+
+        if lot_queue is None:
+            lot_queue = LotQueue(name, self._policies[0], self._long_term_days)
+
+        # Rows already booked by a restored queue are skipped
+        new_buy_txns: list[TransactionRow] = buy_txns[lot_queue.buy_count :]
+        new_sell_txns: list[TransactionRow] = sell_txns[lot_queue.sell_count :]
+
+        final_txns: list[Transaction]
+        if lot_queue.policy != "fifo":
+            final_txns = self._book_in_date_order(
+                new_buy_txns, new_sell_txns, lot_queue
             )
+        elif (
+            self._engine == "columnar"
+            # Gains are summarized row by row, so only by the queue
+            and self._long_term_days is None
+            and self._book_columnar(new_buy_txns, new_sell_txns, lot_queue)
+        ):
+            final_txns = lot_queue.transactions()
+        else:
+            # Adding all buy transactions as open lots
+            for buy_txn in new_buy_txns:
+                lot_queue.buy(buy_txn)
 
-        # Booking sell transactions
-        self._book_transactions(sell_txns, final_txns)
+            # Booking sell transactions
+            final_txns = self._book_transactions(new_sell_txns, lot_queue)
 
         # Print summary
         self._print_summary(final_txns)
 
         return final_txns
 
+    def _segregate_txns(
+        self: Self, transaction_rows: list[TransactionRow]
+    ) -> tuple[list[TransactionRow], list[TransactionRow]]:
+        """Split the rows of a fund into its buy and sell transactions"""
+        return (
+            self._get_buy_txns(transaction_rows),
+            self._get_sell_txns(transaction_rows),
+        )
+
     def _get_buy_txns(
         self: Self, transaction_rows: list[TransactionRow]
     ) -> list[TransactionRow]:
@@ -161,55 +780,54 @@ class TransactionService:
         return sell_txns
 
     def _book_transactions(
-        self: Self, sell_txns: list[TransactionRow], final_txns: list[Transaction]
-    ):
+        self: Self, sell_txns: list[TransactionRow], lot_queue: LotQueue
+    ) -> list[Transaction]:
         for sell_txn in sell_txns:
-            qty_to_sell: Decimal = abs(sell_txn.qty)
-
-            for index, txn in enumerate(final_txns):
-                # Ignore already sold transactions
-                if txn.buy_sell is TransactionType.SELL:
-                    continue
-
-                # Sufficient quantity to sell -> sell the whole transaction
-                if qty_to_sell >= txn.qty:
-                    txn.buy_sell = TransactionType.SELL
-                    txn.sell_date = sell_txn.date
-                    txn.sell_price = sell_txn.price
-
-                    # Reduce quantity left to sell
-                    qty_to_sell -= txn.qty
-
-                    # If quantity is zero, end the loop
-                    if qty_to_sell == 0:
-                        break
-
-                # Insufficient quantity to sell -> split the transaction into 2
-                elif qty_to_sell < txn.qty:
-                    total_qty: Decimal = txn.qty
-
-                    # Fully sell the existing transaction and reduce the quantity
-                    txn.buy_sell = TransactionType.SELL
-                    txn.qty = qty_to_sell
-                    txn.sell_date = sell_txn.date
-                    txn.sell_price = sell_txn.price
-
-                    # Create a buy transaction with the unsold quantity
-                    final_txns.insert(
-                        index + 1,
-                        Transaction(
-                            name=txn.name,
-                            buy_sell=TransactionType.BUY,
-                            qty=total_qty - qty_to_sell,
-                            buy_date=txn.buy_date,
-                            buy_price=txn.buy_price,
-                        ),
-                    )
-
-                    # No more quantity left to sell, end the loop
-                    break
+            lot_queue.sell(sell_txn)
+
+        return lot_queue.transactions()
+
+    def _book_in_date_order(
+        self: Self,
+        buy_txns: list[TransactionRow],
+        sell_txns: list[TransactionRow],
+        lot_queue: LotQueue,
+    ) -> list[Transaction]:
+        # Unlike fifo, which lots a sell takes depends on which ones are open
+        # at the time, so buys and sells are booked by date, buys first. A
+        # scheme held under several folios is listed folio by folio, so each
+        # side is put in date order before the two are merged
+        for _, is_sell, txn_row in heapq.merge(
+            ((buy_txn.date, False, buy_txn) for buy_txn in in_date_order(buy_txns)),
+            ((sell_txn.date, True, sell_txn) for sell_txn in in_date_order(sell_txns)),
+            key=itemgetter(0, 1),
+        ):
+            if is_sell:
+                lot_queue.sell(txn_row)
+            else:
+                lot_queue.buy(txn_row)
+
+        return lot_queue.transactions()
+
+    def _book_columnar(
+        self: Self,
+        buy_txns: list[TransactionRow],
+        sell_txns: list[TransactionRow],
+        lot_queue: LotQueue,
+    ) -> bool:
+        from engines.ColumnarBooking import book_columnar
+
+        if book_columnar(lot_queue, buy_txns, sell_txns):
+            return True
+
+        logging.debug("Quantities of %s overflow, booking row by row", lot_queue.name)
+        return False
 
     def _print_summary(self: Self, transactions: list[Transaction]):
+        # The totals are only logged in verbose mode, so only then counted
+        if not logging.root.isEnabledFor(logging.DEBUG):
+            return
+
         buy_qty = 0
         sell_qty = 0
 
@@ -223,29 +841,43 @@ class TransactionService:
         logging.debug("Total qty held: %s", buy_qty)
         logging.debug("Total qty booked: %s", sell_qty)
 
-    def _create_list(self: Self, transactions: list[Transaction]):
+    def _print_list(self: Self, transactions: list[Transaction]):
         logging.info("Final count of all transactions: %s", len(transactions))
 
-        tuple_list: list[tuple] = []
-        tuple_list.append(
-            [
-                "Fund Name",
-                "Buy/Sell",
-                "Units",
-                "Buy Date",
-                "Buy Price",
-                "Sell Date",
-                "Sell Price",
-            ]
-        )
-        for txn in transactions:
-            tuple_list.append(txn.to_tuple())
-
-        print(tabulate(tuple_list[1:], headers=tuple_list[0]))
-
-        return tuple_list
-
-    def _get_sheet_name(self: Self):
+        if self._console == "full":
+            print_table(transactions, self.HEADER)
+        elif self._console == "head-tail":
+            print_head_tail(transactions, self.HEADER, self._console_rows)
+        elif self._console == "stream":
+            print_stream(transactions, self.HEADER)
+        elif self._console == "summary":
+            print_summary(transactions)
+
+    def _get_output_filename(self: Self, policy: str) -> str:
+        """Name the output file of a policy, when several are written"""
+        if len(self._policies) == 1:
+            return self._output_filename
+
+        root, extension = os.path.splitext(self._output_filename)
+        return f"{root}_{policy}{extension}"
+
+    def _get_layout(self: Self) -> dict:
+        """Describe the input layout, so checkpoints of another one are ignored"""
+        return {**self._get_parse_layout(), "long_term_days": self._long_term_days}
+
+    def _get_parse_layout(self: Self) -> dict:
+        """Describe how rows are decoded, so cached rows of another are missed"""
+        return {
+            "service": type(self).__name__,
+            "first_row": self._first_row,
+            "name_col": self._name_col,
+            "date_col": self._date_col,
+            "qty_col": self._qty_col,
+            "price_col": self._price_col,
+            "date_format": self._date_format,
+        }
+
+    def get_sheet_name(self: Self):
         if self._asset_type is AssetType.MUTUAL_FUND:
             return "MF Data"
         elif self._asset_type is AssetType.STOCK:
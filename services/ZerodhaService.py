@@ -7,16 +7,15 @@ This module contains a class to process Zerodha transactions
 """
 
 from argparse import Namespace
-from decimal import Decimal
 import logging
-from typing import Self
+from operator import itemgetter
+from typing import Callable, Self, Sequence
 
 from enums.AssetType import AssetType
 from enums.TransactionType import TransactionType
-from models.Transaction import Transaction
 from models.TransactionRow import TransactionRow
 from services.TransactionService import TransactionService
-from utils.dates import get_timestamp, to_datetime
+from utils.dates import get_timestamp
 
 
 class ZerodhaService(TransactionService):
@@ -30,10 +29,18 @@ class ZerodhaService(TransactionService):
     _PRICE_COL: int = 10
     _DATE_FORMAT: str = "%Y-%m-%d"
 
-    def __init__(self: Self, args: Namespace) -> None:
-        output_filename: str | None = args.output_filename
+    def __init__(self: Self, args: Namespace | None = None, **options) -> None:
+        if args is not None:
+            options = {**self.get_options(args), **options}
+
+        output_filename: str | None = options.pop("output_filename", None)
         if output_filename is None:
-            output_filename: str = "zerodha_output_" + get_timestamp() + ".xlsx"
+            output_filename: str = (
+                "zerodha_output_"
+                + get_timestamp()
+                + "."
+                + options.get("output_format", "xlsx")
+            )
 
         super().__init__(
             self._FIRST_ROW,
@@ -42,128 +49,69 @@ class ZerodhaService(TransactionService):
             self._QTY_COL,
             self._PRICE_COL,
             self._DATE_FORMAT,
-            args.input_filename,
+            options.pop("input_filename", None),
             output_filename,
-            AssetType.MUTUAL_FUND,
+            AssetType.STOCK,
+            **options,
         )
 
-    def _create_txn_row_map(
-        self: Self, txn_rows: list[TransactionRow]
-    ) -> dict[str : list[TransactionRow]]:
-        txn_row_map: dict[str : list[TransactionRow]] = {}
+    def get_sheet_name(self: Self):
+        # Trades are of stocks, but their sheet keeps the name it always had,
+        # which readers of the output look for
+        return "MF Data"
 
-        for txn in txn_rows[self._FIRST_ROW :]:
-            if txn[self._QTY_COL] is None or txn[self._QTY_COL] == 0:
-                continue
-
-            name: str = txn[self._NAME_COL].strip()
+    def _get_columns(self: Self) -> tuple[int, ...]:
+        return (
+            self._NAME_COL,
+            self._DATE_COL,
+            self._QTY_COL,
+            self._PRICE_COL,
+            self._BUY_SELL_COL,
+        )
 
-            txn_row = TransactionRow(
-                buy_sell=TransactionType(txn[self._BUY_SELL_COL].upper()),
-                qty=Decimal(str(txn[self._QTY_COL])),
-                date=to_datetime(txn[self._DATE_COL], self._DATE_FORMAT),
-                price=Decimal(str(txn[self._PRICE_COL])),
-            )
+    def _compile_side_decoder(
+        self: Self,
+    ) -> Callable[[Sequence], TransactionType] | None:
+        get_side: itemgetter = itemgetter(self._BUY_SELL_COL - min(self._get_columns()))
 
-            if name in txn_row_map:
-                txn_row_map[name].append(txn_row)
-            else:
-                txn_row_map[name] = [txn_row]
+        def decode_side(row: Sequence) -> TransactionType:
+            return TransactionType(get_side(row).upper())
 
-        return txn_row_map
+        return decode_side
 
-    def _get_buy_txns(
+    def _segregate_txns(
         self: Self, transaction_rows: list[TransactionRow]
-    ) -> list[TransactionRow]:
+    ) -> tuple[list[TransactionRow], list[TransactionRow]]:
+        """Merge fills of the same side, date and price, in a single pass"""
         buy_txns: list[TransactionRow] = []
-
-        i: int = 0
-        while i < len(transaction_rows):
-            if transaction_rows[i].buy_sell == TransactionType.SELL:
-                i += 1
-                continue
-
-            qty: Decimal = transaction_rows[i].qty
-            j: int = i + 1
-
-            while (
-                j < len(transaction_rows)
-                and transaction_rows[i].buy_sell == transaction_rows[j].buy_sell
-                and transaction_rows[i].date == transaction_rows[j].date
-                and transaction_rows[i].price == transaction_rows[j].price
-            ):
-                qty += transaction_rows[j].qty
-                j += 1
-
-            if i != j + 1:
-                transaction_rows[i].qty = qty
-
-            buy_txns.append(transaction_rows[i])
-
-            i = j
-
-        logging.debug("Found %s buy transactions", len(buy_txns))
-
-        return buy_txns
-
-    def _get_sell_txns(
-        self: Self, transaction_rows: list[TransactionRow]
-    ) -> list[TransactionRow]:
         sell_txns: list[TransactionRow] = []
 
-        i: int = 0
-        while i < len(transaction_rows):
-            if transaction_rows[i].buy_sell == TransactionType.BUY:
-                i += 1
-                continue
+        # Position of each order's row, so later fills are merged into it even
+        # when other fills came in between
+        orders: dict[tuple, tuple[list[TransactionRow], int]] = {}
 
-            qty: Decimal = transaction_rows[i].qty
-            j: int = i + 1
+        for txn_row in transaction_rows:
+            key: tuple = (txn_row.buy_sell, txn_row.date, txn_row.price)
+            order: tuple[list[TransactionRow], int] | None = orders.get(key)
 
-            while (
-                j < len(transaction_rows)
-                and transaction_rows[i].buy_sell == transaction_rows[j].buy_sell
-                and transaction_rows[i].date == transaction_rows[j].date
-                and transaction_rows[i].price == transaction_rows[j].price
-            ):
-                qty += transaction_rows[j].qty
-                j += 1
-
-            if i != j + 1:
-                transaction_rows[i].qty = qty
-
-            sell_txns.append(transaction_rows[i])
+            if order is None:
+                txns: list[TransactionRow] = (
+                    sell_txns if txn_row.buy_sell == TransactionType.SELL else buy_txns
+                )
+                orders[key] = (txns, len(txns))
+                txns.append(txn_row)
+                continue
 
-            i = j
+            # Merge into a new row, leaving the parsed rows untouched
+            txns, i = order
+            txns[i] = TransactionRow(
+                qty=txns[i].qty + txn_row.qty,
+                date=txn_row.date,
+                price=txn_row.price,
+                buy_sell=txn_row.buy_sell,
+            )
 
+        logging.debug("Found %s buy transactions", len(buy_txns))
         logging.debug("Found %s sell transactions", len(sell_txns))
 
-        return sell_txns
-
-    def _compress_buy_transactions(
-        self: Self, transactions: list[Transaction]
-    ) -> list[Transaction]:
-        compressed_txns: list[Transaction] = []
-
-        i: int = 0
-        while i < len(transactions):
-            qty: Decimal = transactions[i].qty
-            j: int = i + 1
-
-            while (
-                j < len(transactions)
-                and transactions[i].buy_date == transactions[j].buy_date
-                and transactions[i].buy_price == transactions[j].buy_price
-            ):
-                qty += transactions[j].qty
-                j += 1
-                logging.debug("Compressed transactions for %s", transactions[i].name)
-
-            if i != j + 1:
-                transactions[i].qty = qty
-
-            compressed_txns.append(transactions[i])
-
-            i = j
-
-        return compressed_txns
+        return buy_txns, sell_txns
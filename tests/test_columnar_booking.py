@@ -0,0 +1,110 @@
+"""
+tests.test_columnar_booking
+~~~~~~~~~~~~~~
+
+This module contains checks that the columnar engine books exactly what the
+fifo LotQueue books, down to the decimal exponent of every quantity.
+Run python3 -m pytest from the repository root.
+
+"""
+
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from engines.LotQueue import LotQueue
+from models.TransactionRow import TransactionRow
+
+pytest.importorskip("numpy")
+
+from engines.ColumnarBooking import book_columnar  # noqa: E402
+
+# Quantities of whole units, of registrar precision, and with trailing zeros,
+# whose exponents Decimal arithmetic carries into the booked pieces
+_QTY_FORMATS: tuple[str, ...] = ("{:.0f}", "{:.1f}", "{:.3f}", "{:.4f}", "{:.2f}0")
+
+
+def random_rows(
+    rnd: random.Random, count: int, start: datetime
+) -> tuple[list[TransactionRow], list[TransactionRow]]:
+    buy_txns: list[TransactionRow] = []
+    sell_txns: list[TransactionRow] = []
+    day: datetime = start
+
+    for _ in range(count):
+        day += timedelta(days=rnd.randrange(1, 10))
+        qty = Decimal(rnd.choice(_QTY_FORMATS).format(rnd.uniform(0.5, 40)))
+        price = Decimal(rnd.randrange(1000, 9000)) / 100
+
+        if rnd.random() < 0.4:
+            sell_txns.append(TransactionRow(qty=-qty, date=day, price=price))
+        else:
+            buy_txns.append(TransactionRow(qty=qty, date=day, price=price))
+
+    return buy_txns, sell_txns
+
+
+def book_queue(
+    lot_queue: LotQueue,
+    buy_txns: list[TransactionRow],
+    sell_txns: list[TransactionRow],
+):
+    for buy_txn in buy_txns:
+        lot_queue.buy(buy_txn)
+    for sell_txn in sell_txns:
+        lot_queue.sell(sell_txn)
+
+
+def snapshot(lot_queue: LotQueue) -> tuple:
+    # Lot quantities are compared as text, so their exponents must match too.
+    # The unfilled quantity is only ever compared with zero
+    return (
+        [txn.to_tuple() for txn in lot_queue.transactions()],
+        lot_queue.buy_count,
+        lot_queue.sell_count,
+        lot_queue.unfilled_qty,
+    )
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_lot_queue(seed):
+    rnd = random.Random(seed)
+    start = datetime(2020, 1, 1)
+
+    # Part of the history is booked first, and its open lots restored
+    earlier: tuple = random_rows(rnd, rnd.randrange(0, 30), start)
+    later: tuple = random_rows(rnd, rnd.randrange(0, 60), start + timedelta(1000))
+
+    restored = LotQueue("Fund")
+    book_queue(restored, *earlier)
+    state: dict = restored.to_state()
+
+    expected = LotQueue.from_state("Fund", state)
+    book_queue(expected, *later)
+
+    columnar = LotQueue.from_state("Fund", state)
+    assert book_columnar(columnar, *later)
+
+    assert snapshot(columnar) == snapshot(expected)
+
+
+def test_declines_quantities_it_cannot_scale():
+    day = datetime(2020, 1, 1)
+    lot_queue = LotQueue("Fund")
+
+    # Exponent notation, and a quantity past 64 bits once scaled
+    assert not book_columnar(
+        lot_queue, [TransactionRow(qty=Decimal("5E+1"), date=day, price=Decimal(1))], []
+    )
+    assert not book_columnar(
+        lot_queue,
+        [
+            TransactionRow(qty=Decimal("123456789012345"), date=day, price=Decimal(1)),
+            TransactionRow(qty=Decimal("0.0001"), date=day, price=Decimal(1)),
+        ],
+        [],
+    )
+
+    assert snapshot(lot_queue) == snapshot(LotQueue("Fund"))
@@ -0,0 +1,126 @@
+"""
+tests.test_lot_checkpoint
+~~~~~~~~~~~~~~
+
+This module contains checks that a booking resumed from a checkpoint matches
+booking every row, and that a checkpoint is dropped once it no longer holds.
+Run python3 -m pytest from the repository root.
+
+"""
+
+import logging
+
+from benchmarks.statements import generate_rows
+from services.CamsService import CamsService
+
+_POLICIES: tuple[str, ...] = ("fifo", "lifo", "average", "hifo")
+
+
+def book(rows: list[list], checkpoint_filename: str | None = None) -> dict:
+    service = CamsService(
+        input_rows=rows,
+        checkpoint_filename=checkpoint_filename,
+        console="none",
+        policies=_POLICIES,
+    )
+
+    return {
+        policy: [txn.to_tuple() for txn in txns]
+        for policy, txns in service.process_policies().items()
+    }
+
+
+def test_resume_matches_full_booking(tmp_path, caplog):
+    rows: list[list] = generate_rows("cams", 5, 30)
+    checkpoint_filename: str = str(tmp_path / "checkpoint.json")
+
+    # Rows are in date order, so a prefix is an earlier statement of the same
+    # history
+    book(rows[: len(rows) // 2], checkpoint_filename)
+
+    with caplog.at_level(logging.DEBUG):
+        resumed: dict = book(rows, checkpoint_filename)
+
+    assert "Resuming" in caplog.text
+    assert resumed == book(rows)
+
+
+def test_changed_history_is_booked_again(tmp_path, caplog):
+    rows: list[list] = generate_rows("cams", 5, 30)
+    checkpoint_filename: str = str(tmp_path / "checkpoint.json")
+
+    book(rows, checkpoint_filename)
+
+    # Restate the price of the first booked row
+    changed: list[list] = [list(row) for row in rows]
+    changed[1][CamsService._PRICE_COL] += 1
+
+    with caplog.at_level(logging.DEBUG):
+        rebooked: dict = book(changed, checkpoint_filename)
+
+    assert "changed, booking all rows" in caplog.text
+    assert rebooked == book(changed)
+
+
+def test_checkpoint_of_another_layout_is_ignored(tmp_path, caplog):
+    rows: list[list] = generate_rows("cams", 5, 30)
+    checkpoint_filename: str = str(tmp_path / "checkpoint.json")
+
+    # Summarizing changes the layout, as the lots then carry their gains
+    CamsService(
+        input_rows=rows,
+        checkpoint_filename=checkpoint_filename,
+        console="none",
+        policies=_POLICIES,
+        summary=True,
+    ).process_policies()
+
+    with caplog.at_level(logging.DEBUG):
+        booked: dict = book(rows, checkpoint_filename)
+
+    assert "of another layout" in caplog.text
+    assert "Resuming" not in caplog.text
+    assert booked == book(rows)
+
+
+def test_failed_read_keeps_checkpoint(tmp_path):
+    checkpoint_filename: str = str(tmp_path / "checkpoint.json")
+    book(generate_rows("cams", 5, 30), checkpoint_filename)
+
+    with open(checkpoint_filename, "rb") as file:
+        saved: bytes = file.read()
+
+    # A workbook that cannot be opened books nothing
+    file_name: str = str(tmp_path / "statement.xlsx")
+    with open(file_name, "wb") as file:
+        file.write(b"PK\x03\x04")
+
+    CamsService(
+        input_filename=file_name,
+        checkpoint_filename=checkpoint_filename,
+        console="none",
+        policies=_POLICIES,
+    ).process_policies()
+
+    with open(checkpoint_filename, "rb") as file:
+        assert file.read() == saved
+
+
+def test_funds_missing_from_a_run_keep_their_checkpoint(tmp_path, caplog):
+    rows: list[list] = generate_rows("cams", 5, 30)
+    checkpoint_filename: str = str(tmp_path / "checkpoint.json")
+    book(rows, checkpoint_filename)
+
+    # A statement of a single fund, and then the full one again
+    name: str = rows[1][CamsService._NAME_COL]
+    book(
+        rows[:1] + [row for row in rows[1:] if row[CamsService._NAME_COL] == name],
+        checkpoint_filename,
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        resumed: dict = book(rows, checkpoint_filename)
+
+    assert "changed, booking all rows" not in caplog.text
+    assert caplog.text.count("Resuming") == 5 * len(_POLICIES)
+    assert resumed == book(rows)
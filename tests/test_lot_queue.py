@@ -0,0 +1,184 @@
+"""
+tests.test_lot_queue
+~~~~~~~~~~~~~~
+
+This module contains checks of the lots each lot-matching policy books.
+Run python3 -m pytest from the repository root.
+
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from engines.LotQueue import LotQueue
+from models.TransactionRow import TransactionRow
+from services.CamsService import CamsService
+
+
+def row(qty: str, day: int, price: str) -> TransactionRow:
+    return TransactionRow(
+        qty=Decimal(qty), date=datetime(2020, 1, day), price=Decimal(price)
+    )
+
+
+def lots(lot_queue: LotQueue) -> list[tuple[str, str, str, str]]:
+    # Side, units, buy price and sell price of each lot
+    return [
+        (txn.buy_sell.value, str(txn.qty), str(txn.buy_price), str(txn.sell_price))
+        for txn in lot_queue.transactions()
+    ]
+
+
+def book(policy: str, buy_txns: list, sell_txns: list) -> LotQueue:
+    lot_queue = LotQueue("Fund", policy)
+    for buy_txn in buy_txns:
+        lot_queue.buy(buy_txn)
+    for sell_txn in sell_txns:
+        lot_queue.sell(sell_txn)
+
+    return lot_queue
+
+
+_BUYS: list[TransactionRow] = [
+    row("10", 1, "10"),
+    row("10", 2, "20"),
+    row("10", 3, "15"),
+]
+_SELLS: list[TransactionRow] = [row("-15", 4, "25")]
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        (
+            "fifo",
+            [
+                ("SELL", "10", "10", "25"),
+                ("SELL", "5", "20", "25"),
+                ("BUY", "5", "20", "None"),
+                ("BUY", "10", "15", "None"),
+            ],
+        ),
+        (
+            "lifo",
+            [
+                ("SELL", "10", "15", "25"),
+                ("SELL", "5", "20", "25"),
+                ("BUY", "10", "10", "None"),
+                ("BUY", "5", "20", "None"),
+            ],
+        ),
+        (
+            "hifo",
+            [
+                ("SELL", "10", "20", "25"),
+                ("SELL", "5", "15", "25"),
+                ("BUY", "10", "10", "None"),
+                ("BUY", "5", "15", "None"),
+            ],
+        ),
+        (
+            "average",
+            [
+                ("SELL", "10", "15.0000", "25"),
+                ("SELL", "5", "15.0000", "25"),
+                ("BUY", "5", "15.0000", "None"),
+                ("BUY", "10", "15.0000", "None"),
+            ],
+        ),
+    ],
+)
+def test_policy_picks_lots(policy, expected):
+    assert lots(book(policy, _BUYS, _SELLS)) == expected
+
+
+def test_average_cost_follows_later_buys():
+    lot_queue = book("average", _BUYS, _SELLS)
+
+    # 15 units held at 15, and 15 more bought at 21, average 18
+    lot_queue.buy(row("15", 5, "21"))
+    lot_queue.sell(row("-10", 6, "30"))
+
+    assert lots(lot_queue)[2] == ("SELL", "5", "18.0000", "30")
+    assert lots(lot_queue)[3] == ("SELL", "5", "18.0000", "30")
+    assert sum(Decimal(lot[1]) for lot in lots(lot_queue) if lot[0] == "BUY") == 20
+
+
+def test_hifo_sells_oldest_of_equal_cost_first():
+    buy_txns: list[TransactionRow] = [
+        row("1", 1, "10"),
+        row("2", 2, "30"),
+        row("3", 3, "30"),
+    ]
+
+    assert lots(book("hifo", buy_txns, [row("-4", 4, "40")])) == [
+        ("SELL", "2", "30", "40"),
+        ("SELL", "2", "30", "40"),
+        ("BUY", "1", "10", "None"),
+        ("BUY", "1", "30", "None"),
+    ]
+
+
+def test_unfilled_sell_is_recorded():
+    lot_queue = book("lifo", [row("5", 1, "10")], [row("-7.5", 2, "12")])
+
+    assert lots(lot_queue) == [("SELL", "5", "10", "12")]
+    assert lot_queue.unfilled_qty == Decimal("2.5")
+
+
+def statement(txns: list[tuple]) -> list[list]:
+    # Rows laid out like a CAMS statement, below its header row
+    width: int = CamsService._PRICE_COL + 1
+    rows: list[list] = [["Header"] * width]
+    for name, day, qty, price in txns:
+        cells: list = [None] * width
+        cells[CamsService._NAME_COL] = name
+        cells[CamsService._DATE_COL] = day
+        cells[CamsService._QTY_COL] = qty
+        cells[CamsService._PRICE_COL] = price
+        rows.append(cells)
+
+    return rows
+
+
+@pytest.mark.parametrize("policy", ["lifo", "hifo"])
+def test_sell_only_takes_lots_bought_before_it(policy):
+    # A later buy at a higher price is neither the newest nor the costliest
+    # lot when the sell comes
+    rows: list[list] = statement(
+        [
+            ("Fund", "01-Jan-2020", 10, 10),
+            ("Fund", "02-Jan-2020", -5, 12),
+            ("Fund", "03-Jan-2020", 10, 30),
+        ]
+    )
+
+    txns = CamsService(input_rows=rows, console="none", policies=[policy]).process()
+
+    assert [(txn.buy_sell.value, str(txn.qty), str(txn.buy_price)) for txn in txns] == [
+        ("SELL", "5", "10"),
+        ("BUY", "5", "10"),
+        ("BUY", "10", "30"),
+    ]
+
+
+@pytest.mark.parametrize("policy", ["lifo", "hifo", "average"])
+def test_rows_out_of_date_order_are_booked_by_date(policy):
+    # A scheme held under two folios is listed folio by folio, so a later buy
+    # can come before an earlier one
+    rows: list[list] = statement(
+        [
+            ("Fund", "03-Jan-2020", 10, 30),
+            ("Fund", "01-Jan-2020", 10, 10),
+            ("Fund", "02-Jan-2020", -5, 12),
+        ]
+    )
+
+    txns = CamsService(input_rows=rows, console="none", policies=[policy]).process()
+
+    # The sell takes the lot bought before it, at cost 10 whatever the policy
+    sells = [txn for txn in txns if txn.buy_sell.value == "SELL"]
+    assert [(str(txn.qty), txn.buy_price) for txn in sells] == [("5", 10)]
+    assert sum(txn.qty for txn in txns if txn.buy_sell.value == "BUY") == 15
@@ -0,0 +1,48 @@
+"""
+tests.test_parse_cache
+~~~~~~~~~~~~~~
+
+This module contains checks that a statement is read from the cache on a
+repeat run, and that the rows of a failed read are never cached.
+Run python3 -m pytest from the repository root.
+
+"""
+
+import os
+
+from benchmarks.statements import generate_rows, write_statement
+from services.CamsService import CamsService
+
+
+def parse(file_name: str, cache_dir: str) -> dict:
+    service = CamsService(input_filename=file_name, cache_dir=cache_dir)
+    return {
+        name: [(row.qty, row.date, row.price, row.buy_sell) for row in txn_rows]
+        for name, txn_rows in service.parse().items()
+    }
+
+
+def test_repeat_run_reads_the_cache(tmp_path):
+    file_name: str = str(tmp_path / "statement.xlsx")
+    cache_dir: str = str(tmp_path / "cache")
+    write_statement(generate_rows("cams", 5, 30), file_name)
+
+    parsed: dict = parse(file_name, cache_dir)
+
+    assert len(os.listdir(cache_dir)) == 1
+    assert parse(file_name, cache_dir) == parsed
+
+
+def test_failed_read_is_not_cached(tmp_path):
+    file_name: str = str(tmp_path / "statement.xlsx")
+    cache_dir: str = str(tmp_path / "cache")
+    write_statement(generate_rows("cams", 5, 30), file_name)
+
+    # A truncated workbook cannot be opened
+    with open(file_name, "rb") as file:
+        data: bytes = file.read()
+    with open(file_name, "wb") as file:
+        file.write(data[: len(data) // 2])
+
+    assert parse(file_name, cache_dir) == {}
+    assert not os.path.exists(cache_dir) or os.listdir(cache_dir) == []
@@ -0,0 +1,34 @@
+"""
+tests.test_processing_engine
+~~~~~~~~~~~~~~
+
+This module contains checks that the engine refuses the options argparse
+would refuse on the command line.
+Run python3 -m pytest from the repository root.
+
+"""
+
+import pytest
+
+from engines.LotQueue import LotQueue
+from services.ProcessingEngine import ProcessingEngine
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"policies": ()},
+        {"policies": ("specific",)},
+        {"engine": "numpy"},
+        {"long_term_days": -1},
+        {"workers": -1},
+    ],
+)
+def test_unsupported_options_are_refused(options):
+    with pytest.raises(ValueError):
+        ProcessingEngine(**options)
+
+
+def test_unsupported_policy_is_refused_by_the_queue():
+    with pytest.raises(ValueError, match="specific"):
+        LotQueue("Fund", "specific")
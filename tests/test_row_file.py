@@ -0,0 +1,85 @@
+"""
+tests.test_row_file
+~~~~~~~~~~~~~~
+
+This module contains checks that a row file reads back exactly the rows
+written to it, and is only read by the layout that wrote it.
+Run python3 -m pytest from the repository root.
+
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.statements import SERVICES, generate_rows
+from engines.RowFile import RowFile, is_row_file, write_row_file
+from enums.TransactionType import TransactionType
+from models.TransactionRow import TransactionRow
+
+
+def as_tuples(txn_row_map: dict) -> dict[str, list[tuple]]:
+    # Numbers are compared as text, so their notation must match too
+    return {
+        name: [
+            (str(row.qty), row.date, str(row.price), row.buy_sell) for row in txn_rows
+        ]
+        for name, txn_rows in txn_row_map.items()
+    }
+
+
+@pytest.mark.parametrize("company", SERVICES)
+def test_round_trip(tmp_path, company):
+    file_name: str = str(tmp_path / "statement.rows")
+    service = SERVICES[company](input_rows=generate_rows(company, 5, 40))
+    txn_row_map: dict = service.parse()
+
+    write_row_file(file_name, txn_row_map, service._get_parse_layout())
+
+    assert is_row_file(file_name)
+    assert as_tuples(RowFile(file_name).funds()) == as_tuples(txn_row_map)
+    assert RowFile(file_name).layout == service._get_parse_layout()
+
+
+def test_round_trip_keeps_notation(tmp_path):
+    file_name: str = str(tmp_path / "statement.rows")
+    day = datetime(2020, 1, 1)
+    txn_row_map: dict = {
+        "Fund": [
+            TransactionRow(Decimal("10.50"), day, Decimal("7"), TransactionType.BUY),
+            TransactionRow(Decimal("-0.125"), day, Decimal("1E+1")),
+            TransactionRow(Decimal("3"), day, Decimal("0.0001"), TransactionType.SELL),
+        ],
+        "Empty": [],
+    }
+
+    write_row_file(file_name, txn_row_map, {})
+
+    assert as_tuples(RowFile(file_name).funds()) == as_tuples(txn_row_map)
+
+
+def test_dates_with_a_time_are_refused(tmp_path):
+    txn_row_map: dict = {
+        "Fund": [TransactionRow(Decimal(1), datetime(2020, 1, 1, 9, 30), Decimal(1))]
+    }
+
+    with pytest.raises(ValueError):
+        write_row_file(str(tmp_path / "statement.rows"), txn_row_map, {})
+
+
+def test_missing_file_is_not_a_row_file(tmp_path):
+    assert not is_row_file(str(tmp_path / "missing.rows"))
+
+
+def test_row_file_of_another_layout_is_refused(tmp_path):
+    file_name: str = str(tmp_path / "statement.rows")
+    zerodha = SERVICES["zerodha"](input_rows=generate_rows("zerodha", 5, 40))
+    write_row_file(file_name, zerodha.parse(), zerodha._get_parse_layout())
+
+    assert SERVICES["cams"](input_filename=file_name).parse() == {}
+
+    with pytest.raises(ValueError):
+        SERVICES["cams"](input_filename=file_name, strict=True).parse()
+
+    assert len(SERVICES["zerodha"](input_filename=file_name).parse()) == 5
@@ -0,0 +1,28 @@
+"""
+utils.choices
+~~~~~~~~~~~~~~
+
+This module contains the choices of command line options. It imports
+nothing, so that --help does not load the modules that use them.
+
+"""
+
+# fifo and lifo sell the oldest or the newest lot first, average sells lots
+# oldest first at the running average cost, and hifo identifies the lot with
+# the highest cost, oldest first on ties
+POLICIES: tuple[str, ...] = ("fifo", "lifo", "average", "hifo")
+
+OUTPUT_FORMATS: tuple[str, ...] = ("xlsx", "csv", "jsonl")
+
+ENGINES: tuple[str, ...] = ("queue", "columnar")
+
+CONSOLES: tuple[str, ...] = ("full", "head-tail", "stream", "summary", "none")
+
+
+def check_choice(option: str, value: str, choices: tuple[str, ...]):
+    """Raise a ValueError unless a value is one of the choices of an option,
+    as argparse would for the command line"""
+    if value not in choices:
+        raise ValueError(
+            f"Unsupported {option} '{value}', choose from {', '.join(choices)}"
+        )
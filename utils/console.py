@@ -0,0 +1,102 @@
+"""
+utils.console
+~~~~~~~~~~~~~~
+
+This module contains methods to print transactions to the console.
+
+"""
+
+import sys
+from decimal import Decimal
+from itertools import islice
+from typing import Iterable, Sequence
+
+from enums.TransactionType import TransactionType
+from models.Transaction import Transaction
+
+# Fixed column widths of the streamed render, in header order, with numbers
+# right aligned as in the table
+_STREAM_WIDTHS: tuple[int, ...] = (40, 8, 14, 10, 12, 10, 12)
+_STREAM_NUMERIC: tuple[bool, ...] = (False, False, True, False, True, False, True)
+
+# tabulate is imported inside the table functions, so that a run printing
+# nothing or streaming rows never pays for importing it
+
+
+def print_table(transactions: Iterable[Transaction], header: Sequence[str]):
+    """Prints all transactions as a table sized to fit every cell"""
+    from tabulate import tabulate
+
+    print(tabulate((txn.to_tuple() for txn in transactions), headers=header))
+
+
+def print_head_tail(
+    transactions: Sequence[Transaction], header: Sequence[str], rows: int
+):
+    """Prints the first and last rows of the transactions as a table"""
+    from tabulate import tabulate
+
+    if len(transactions) <= rows * 2:
+        print_table(transactions, header)
+        return
+
+    skipped: int = len(transactions) - rows * 2
+    table: list[tuple] = [txn.to_tuple() for txn in transactions[:rows]]
+    table.append((f"... {skipped} more rows",) + ("",) * (len(header) - 1))
+    # Sliced from the front, as a slice from -0 would be the whole list
+    table.extend(txn.to_tuple() for txn in transactions[len(transactions) - rows :])
+
+    print(tabulate(table, headers=header))
+
+
+def print_stream(transactions: Iterable[Transaction], header: Sequence[str]):
+    """Prints transactions in fixed width columns, one row at a time"""
+    write = sys.stdout.write
+
+    write(_format_row(header) + "\n")
+    write("  ".join("-" * width for width in _STREAM_WIDTHS) + "\n")
+
+    # Buffered in chunks, so a large output is not one write per row
+    transactions = iter(transactions)
+    while chunk := list(islice(transactions, 1024)):
+        write("".join(_format_row(txn.to_tuple()) + "\n" for txn in chunk))
+
+
+def print_summary(transactions: Iterable[Transaction]):
+    """Prints the lots and units held and sold of each fund"""
+    from tabulate import tabulate
+
+    funds: dict[str, list] = {}
+
+    for txn in transactions:
+        fund: list | None = funds.get(txn.name)
+        if fund is None:
+            fund = funds[txn.name] = [0, Decimal(0), Decimal(0)]
+
+        if txn.buy_sell == TransactionType.BUY:
+            fund[0] += 1
+            fund[1] += txn.qty
+        else:
+            fund[2] += txn.qty
+
+    print(
+        tabulate(
+            ((name, *fund) for name, fund in funds.items()),
+            headers=["Fund Name", "Open Lots", "Units Held", "Units Sold"],
+        )
+    )
+
+
+def _format_row(row: Sequence[str]) -> str:
+    return "  ".join(
+        _fit(cell, width, numeric)
+        for cell, width, numeric in zip(row, _STREAM_WIDTHS, _STREAM_NUMERIC)
+    ).rstrip()
+
+
+def _fit(cell: str, width: int, numeric: bool) -> str:
+    # Cut long text short, so that it keeps to its column
+    if len(cell) > width:
+        return cell[: width - 1] + "~"
+
+    return cell.rjust(width) if numeric else cell.ljust(width)
@@ -6,14 +6,102 @@ This module contains common date methods.
 
 """
 
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Callable
 
+# Statements repeat a few thousand dates across many rows, so parsed dates are
+# memoized. Bounded, so a long batch run does not grow it without limit
+_CACHE_SIZE: int = 8192
 
-def to_datetime(datestring: str, dateformat: str) -> datetime:
-    """Converts a date string with format dd-MM-yyyy to a datetime object"""
+_MONTHS: dict[str, int] = {
+    month: number
+    for number, month in enumerate(
+        (
+            "jan",
+            "feb",
+            "mar",
+            "apr",
+            "may",
+            "jun",
+            "jul",
+            "aug",
+            "sep",
+            "oct",
+            "nov",
+            "dec",
+        ),
+        start=1,
+    )
+}
+
+
+def to_datetime(datestring: str | date, dateformat: str) -> datetime:
+    """Converts a date string of the given format to a datetime object"""
+    # Excel cells may already hold a date, which needs no parsing
+    if isinstance(datestring, datetime):
+        return datestring
+    if isinstance(datestring, date):
+        return datetime(datestring.year, datestring.month, datestring.day)
+
+    return _parse_datetime(datestring, dateformat)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _parse_datetime(datestring: str, dateformat: str) -> datetime:
+    parser: Callable[[str], datetime | None] | None = _PARSERS.get(dateformat)
+
+    if parser is not None:
+        parsed: datetime | None = parser(datestring)
+        if parsed is not None:
+            return parsed
+
+    # Anything the fast parsers do not handle gets strptime and its errors
     return datetime.strptime(datestring, dateformat)
 
 
+def _parse_iso_date(datestring: str) -> datetime | None:
+    """Parses %Y-%m-%d, or returns None to fall back to strptime"""
+    parts: list[str] = datestring.split("-")
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return None
+
+    year, month, day = parts
+    if len(year) != 4 or len(month) > 2 or len(day) > 2:
+        return None
+
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _parse_month_name_date(datestring: str) -> datetime | None:
+    """Parses %d-%b-%Y, or returns None to fall back to strptime"""
+    parts: list[str] = datestring.split("-")
+    if len(parts) != 3:
+        return None
+
+    day, month, year = parts
+    if not day.isdigit() or len(day) > 2 or not year.isdigit() or len(year) != 4:
+        return None
+
+    month_number: int | None = _MONTHS.get(month.lower())
+    if month_number is None:
+        return None
+
+    try:
+        return datetime(int(year), month_number, int(day))
+    except ValueError:
+        return None
+
+
+_PARSERS: dict[str, Callable[[str], datetime | None]] = {
+    "%Y-%m-%d": _parse_iso_date,
+    "%d-%b-%Y": _parse_month_name_date,
+}
+
+
 def to_datestring(date: datetime) -> str:
     """Converts a datetime object to a date string with format dd-MM-yyyy"""
     if date is None:
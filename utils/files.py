@@ -6,46 +6,187 @@ This module contains common file methods.
 
 """
 
+import csv
+import io
+import json
 import logging
+from itertools import islice
+from typing import IO, TYPE_CHECKING, BinaryIO, Iterable, Iterator, Sequence
 
-from openpyxl import Workbook, load_workbook
-from openpyxl.worksheet._read_only import ReadOnlyWorksheet
-from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from models.Transaction import Transaction
 
+if TYPE_CHECKING:
+    from openpyxl import Workbook
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+    from openpyxl.worksheet._write_only import WriteOnlyWorksheet
 
-def read_excel_to_list(file_name):
+# openpyxl is imported inside the excel functions, so that reading a CSV
+# statement never pays for importing it
+
+_XLSX_SIGNATURE: bytes = b"PK\x03\x04"
+
+# Text outputs are written through a large buffer, in chunks of rows
+_WRITE_BUFFER_SIZE: int = 1 << 20
+_WRITE_CHUNK_ROWS: int = 4096
+
+
+def iter_rows(
+    file: str | IO,
+    first_row: int = 0,
+    first_col: int = 0,
+    end_col: int | None = None,
+    raise_errors: bool = False,
+) -> Iterator[list | tuple]:
+    """Lazily yields the rows of a CSV or excel file, detecting its format.
+
+    The file is a path or an open file object, which is read from its current
+    position and left open. Rows start at a 0-based row, and hold only the
+    cells from first_col up to but excluding end_col, padded with None when a
+    row is shorter. A read error is logged, and raised again if raise_errors
+    is set, rather than ending the rows early.
+    """
+    if isinstance(file, io.TextIOBase):
+        return iter_csv_rows(file, first_row, first_col, end_col, raise_errors)
+
+    if not isinstance(file, str) and not file.seekable():
+        # The format is told from the leading bytes, which must be read again
+        file = io.BytesIO(file.read())
+
+    if is_excel_file(file):
+        return iter_excel_rows(file, first_row, first_col, end_col, raise_errors)
+
+    return iter_csv_rows(file, first_row, first_col, end_col, raise_errors)
+
+
+def is_excel_file(file: str | BinaryIO) -> bool:
+    """Checks whether a file is an xlsx workbook from its leading bytes"""
+    if not isinstance(file, str):
+        position: int = file.tell()
+        signature: bytes = file.read(len(_XLSX_SIGNATURE))
+        file.seek(position)
+        return signature == _XLSX_SIGNATURE
+
+    try:
+        with open(file, "rb") as binary_file:
+            return binary_file.read(len(_XLSX_SIGNATURE)) == _XLSX_SIGNATURE
+    except OSError:
+        # Let the reader of its extension report the missing or unreadable file
+        return not file.lower().endswith(".csv")
+
+
+def iter_csv_rows(
+    file: str | IO,
+    first_row: int = 0,
+    first_col: int = 0,
+    end_col: int | None = None,
+    raise_errors: bool = False,
+) -> Iterator[list]:
+    """Lazily yields the rows of a CSV file, starting at a 0-based row"""
+    try:
+        if isinstance(file, str):
+            with open(file, newline="", encoding="utf-8-sig") as text_file:
+                yield from iter_sequence_rows(
+                    csv.reader(text_file), first_row, first_col, end_col
+                )
+        elif isinstance(file, io.TextIOBase):
+            yield from iter_sequence_rows(
+                csv.reader(file), first_row, first_col, end_col
+            )
+        else:
+            text_file = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+            try:
+                yield from iter_sequence_rows(
+                    csv.reader(text_file), first_row, first_col, end_col
+                )
+            finally:
+                # Leave the caller's file open
+                text_file.detach()
+    except FileNotFoundError:
+        logging.error("No such file exists: %s", file)
+        if raise_errors:
+            raise
+    except Exception as e:
+        logging.error("An error occurred: %s", e)
+        if raise_errors:
+            raise
+
+
+def iter_sequence_rows(
+    rows: Iterable[Sequence],
+    first_row: int = 0,
+    first_col: int = 0,
+    end_col: int | None = None,
+) -> Iterator[list]:
+    """Lazily yields in-memory rows laid out like a file, as iter_rows would"""
+    width: int | None = end_col - first_col if end_col is not None else None
+
+    for row in islice(rows, first_row, None):
+        # Blank cells read as None, like empty cells in a workbook
+        cells: list = [cell if cell != "" else None for cell in row[first_col:end_col]]
+
+        if width is not None and len(cells) < width:
+            cells.extend([None] * (width - len(cells)))
+
+        yield cells
+
+
+def iter_excel_rows(
+    file: str | BinaryIO,
+    first_row: int = 0,
+    first_col: int = 0,
+    end_col: int | None = None,
+    raise_errors: bool = False,
+) -> Iterator[tuple]:
+    """Lazily yields the rows of the active worksheet, starting at a 0-based row"""
+    from openpyxl import load_workbook
+
+    workbook: Workbook | None = None
     try:
-        # Load the workbook
-        workbook: Workbook = load_workbook(file_name)
+        # Load the workbook in read-only mode so rows are parsed on demand
+        workbook = load_workbook(file, read_only=True)
 
         # Select the active worksheet
         sheet: ReadOnlyWorksheet | None = workbook.active
 
-        # Read the data into a list of lists
-        data: list = []
-        for row in sheet.iter_rows(values_only=True):
-            data.append(list(row))
-
-        return data
+        # Stream the data one row at a time
+        yield from sheet.iter_rows(
+            min_row=first_row + 1,
+            min_col=first_col + 1,
+            max_col=end_col,
+            values_only=True,
+        )
     except FileNotFoundError:
-        logging.error("No such file exists: %s", file_name)
-        return []
+        logging.error("No such file exists: %s", file)
+        if raise_errors:
+            raise
     except Exception as e:
         logging.error("An error occurred: %s", e)
-        return []
+        if raise_errors:
+            raise
+    finally:
+        if workbook is not None:
+            workbook.close()
+
 
+def write_rows_to_excel(
+    rows: Iterable[Sequence],
+    header: Iterable[str],
+    workbook_name: str,
+    sheet_name: str,
+):
+    """Streams rows to a write-only workbook, one row at a time"""
+    from openpyxl import Workbook
 
-def write_list_to_excel(data: list[list[str]], workbook_name: str, sheet_name: str):
     try:
-        # Create a new workbook
-        workbook: Workbook = Workbook()
+        # Create a new write-only workbook
+        workbook: Workbook = Workbook(write_only=True)
 
-        # Select the active worksheet
-        sheet: WriteOnlyWorksheet | None = workbook.active
-        sheet.title = sheet_name
+        # Create the only worksheet
+        sheet: WriteOnlyWorksheet = workbook.create_sheet(sheet_name)
 
-        # Write the data
-        for row in data:
+        # Write the header and the data
+        sheet.append(list(header))
+        for row in rows:
             sheet.append(row)
 
         workbook.save(workbook_name)
@@ -53,4 +194,86 @@ def write_list_to_excel(data: list[list[str]], workbook_name: str, sheet_name: s
         logging.info("Saved to %s", workbook_name)
     except Exception as e:
         logging.error("An error occurred: %s", e)
-        return []
+
+
+def write_transactions(
+    transactions: Iterable[Transaction],
+    header: Iterable[str],
+    file_name: str,
+    sheet_name: str,
+    output_format: str = "xlsx",
+):
+    """Streams transactions to a file of the given output format"""
+    write_rows(
+        (txn.to_tuple() for txn in transactions),
+        header,
+        file_name,
+        sheet_name,
+        output_format,
+    )
+
+
+def write_rows(
+    rows: Iterable[Sequence],
+    header: Iterable[str],
+    file_name: str,
+    sheet_name: str,
+    output_format: str = "xlsx",
+):
+    """Streams rows to a file of the given output format"""
+    if output_format == "csv":
+        write_rows_to_csv(rows, header, file_name)
+    elif output_format == "jsonl":
+        write_rows_to_jsonl(rows, header, file_name)
+    else:
+        write_rows_to_excel(rows, header, file_name, sheet_name)
+
+
+def write_rows_to_csv(rows: Iterable[Sequence], header: Iterable[str], file_name: str):
+    """Streams rows to a CSV file, with a header row"""
+    try:
+        with open(
+            file_name,
+            "w",
+            newline="",
+            encoding="utf-8",
+            buffering=_WRITE_BUFFER_SIZE,
+        ) as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+        logging.info("Saved to %s", file_name)
+    except Exception as e:
+        logging.error("An error occurred: %s", e)
+
+
+def write_rows_to_jsonl(
+    rows: Iterable[Sequence[str]], header: Iterable[str], file_name: str
+):
+    """Streams rows of strings to a JSON Lines file, one object keyed by header"""
+    # Every value is a string, so each line is the encoded keys around the
+    # encoded values
+    keys: list[str] = [json.dumps(key) + ": " for key in header]
+    encode = json.encoder.encode_basestring_ascii
+
+    try:
+        with open(
+            file_name, "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE
+        ) as file:
+            rows = iter(rows)
+            while chunk := list(islice(rows, _WRITE_CHUNK_ROWS)):
+                file.write(
+                    "".join(
+                        "{"
+                        + ", ".join(
+                            key + encode(value) for key, value in zip(keys, row)
+                        )
+                        + "}\n"
+                        for row in chunk
+                    )
+                )
+
+        logging.info("Saved to %s", file_name)
+    except Exception as e:
+        logging.error("An error occurred: %s", e)
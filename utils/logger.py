@@ -6,8 +6,10 @@ This module contains a function to setup logger.
 
 """
 
+import atexit
 import logging
 from enum import Enum
+from queue import Queue
 
 
 # Define color codes
@@ -42,19 +44,40 @@ class ColoredFormatter(logging.Formatter):
 
 # Setup logging
 def setup_logging(verbose=False):
+    # Imported here, as logging.handlers is slow to import for --help
+    from logging.handlers import QueueHandler, QueueListener
+
     level: int = logging.DEBUG if verbose else logging.INFO
 
     # Create logger and set level to INFO
     logger: logging.Logger = logging.getLogger()
     logger.setLevel(level)
 
+    # Records are queued, and formatted and written by a background thread, so
+    # the processing thread never waits on the console. Process pools do not
+    # fork this process and its thread, see utils.pool
+    log_queue: Queue = Queue()
+    listener = QueueListener(log_queue, _create_console_handler(level))
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Add the handler to the logger
+    logger.addHandler(QueueHandler(log_queue))
+
+
+def setup_worker_logging(level: int):
+    """Log to the console directly, in a pool worker, at the parent's level"""
+    logger: logging.Logger = logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(_create_console_handler(level))
+
+
+def _create_console_handler(level: int) -> logging.Handler:
     # Create console handler and set level to INFO
     console_handler = logging.StreamHandler()
     console_handler.setLevel(level)
 
     # Create formatter and add it to the handler
-    formatter = ColoredFormatter()
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(ColoredFormatter())
 
-    # Add the handler to the logger
-    logger.addHandler(console_handler)
+    return console_handler
@@ -0,0 +1,65 @@
+"""
+utils.pipeline
+~~~~~~~~~~~~~~
+
+This module contains a method to run items through stages in threads, so that
+each stage works on the next item while later stages work on earlier ones.
+
+"""
+
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+# Marks the end of the items in a queue
+_DONE: object = object()
+
+
+def run_pipeline(
+    items: Iterable,
+    stages: Sequence[Callable[[Any], Any]],
+    queue_size: int = 1,
+) -> Iterator[tuple[Any, Any]]:
+    """Lazily yields each item with the value its last stage returned, in order.
+
+    Each stage runs in its own thread, passing on the value it returns to the
+    next stage through a queue of at most queue_size values, so no more than
+    that many are held between stages. The exception raised by a stage is
+    yielded in place of the value, skipping the later stages for that item.
+    """
+    # A queue of no size holds any number of values
+    if queue_size < 1:
+        raise ValueError(f"queue_size must be at least 1, got {queue_size}")
+
+    values: Queue = Queue(maxsize=queue_size)
+    Thread(target=_feed, args=(items, values), daemon=True).start()
+
+    for stage in stages:
+        results: Queue = Queue(maxsize=queue_size)
+        Thread(target=_run_stage, args=(stage, values, results), daemon=True).start()
+        values = results
+
+    while (result := values.get()) is not _DONE:
+        yield result
+
+
+def _feed(items: Iterable, values: Queue):
+    for item in items:
+        values.put((item, item))
+
+    values.put(_DONE)
+
+
+def _run_stage(stage: Callable[[Any], Any], values: Queue, results: Queue):
+    while (value := values.get()) is not _DONE:
+        item, value = value
+
+        if not isinstance(value, Exception):
+            try:
+                value = stage(value)
+            except Exception as e:
+                value = e
+
+        results.put((item, value))
+
+    results.put(_DONE)
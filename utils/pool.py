@@ -0,0 +1,37 @@
+"""
+utils.pool
+~~~~~~~~~~~~~~
+
+This module contains a method to create process pools whose workers start
+from a clean process and log like the parent.
+
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.logger import setup_worker_logging
+
+
+def create_process_pool(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """Create a process pool whose workers are not forked from this process.
+
+    The parent logs through a listener thread, and forking a process that
+    runs threads can deadlock the child on a lock another thread held.
+    Workers are instead forked from a single-threaded server process, or
+    spawned where there is none. Either way they start without the parent's
+    handlers, so each logs to the console itself at the parent's level.
+    """
+    start_method: str = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=setup_worker_logging,
+        initargs=(logging.getLogger().level,),
+    )
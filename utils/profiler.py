@@ -0,0 +1,193 @@
+"""
+utils.profiler
+~~~~~~~~~~~~~~
+
+This module contains a class to time and trace the stages of a run.
+
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Self
+
+if TYPE_CHECKING:
+    from cProfile import Profile
+
+# tracemalloc, cProfile and tabulate are imported only once profiling is
+# enabled, so a normal run never pays for them
+
+
+class Profiler:
+    """A class recording the wall time, CPU time and allocations of each stage"""
+
+    _enabled: bool
+    _report_filename: str | None
+    _cprofile_filename: str | None
+    _stages: dict[str, dict]
+    _cprofiles: dict[str, "Profile"]
+
+    def __init__(
+        self: Self,
+        enabled: bool = False,
+        report_filename: str | None = None,
+        cprofile_filename: str | None = None,
+    ) -> None:
+        # Asking for a report or cProfile output implies profiling
+        self._enabled = (
+            enabled or report_filename is not None or cprofile_filename is not None
+        )
+        self._report_filename = report_filename
+        self._cprofile_filename = cprofile_filename
+        self._stages = {}
+        self._cprofiles = {}
+
+    @property
+    def enabled(self: Self) -> bool:
+        return self._enabled
+
+    @contextmanager
+    def stage(self: Self, name: str) -> Iterator[None]:
+        """Measure the enclosed block as a stage, doing nothing when disabled"""
+        if not self._enabled:
+            yield
+            return
+
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        tracemalloc.reset_peak()
+        start_bytes: int = tracemalloc.get_traced_memory()[0]
+
+        # A stage run again, such as once per policy, adds to its profile
+        cprofile: Profile | None = None
+        if self._cprofile_filename is not None:
+            from cProfile import Profile
+
+            cprofile = self._cprofiles.get(name) or Profile()
+
+        start_cpu: float = _cpu_time()
+        start_wall: float = time.perf_counter()
+
+        if cprofile is not None:
+            cprofile.enable()
+
+        try:
+            yield
+        finally:
+            if cprofile is not None:
+                cprofile.disable()
+                self._cprofiles[name] = cprofile
+
+            wall: float = time.perf_counter() - start_wall
+            cpu: float = _cpu_time() - start_cpu
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+
+            stage: dict = self._stages.setdefault(
+                name,
+                {
+                    "wall_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "allocated_bytes": 0,
+                    "peak_bytes": 0,
+                },
+            )
+            stage["wall_seconds"] += wall
+            stage["cpu_seconds"] += cpu
+            stage["allocated_bytes"] += current_bytes - start_bytes
+            stage["peak_bytes"] = max(stage["peak_bytes"], peak_bytes - start_bytes)
+
+    def __reduce__(self: Self) -> tuple:
+        # Worker processes get a disabled profiler, as stages are timed here
+        return (Profiler, ())
+
+    def report(self: Self):
+        """Print the breakdown, and save the report and cProfile output if asked"""
+        if not self._enabled:
+            return
+
+        import tracemalloc
+
+        tracemalloc.stop()
+
+        self._print_report()
+
+        if self._report_filename is not None:
+            self._save_report()
+
+        if self._cprofile_filename is not None:
+            self._save_cprofile()
+
+    def _print_report(self: Self):
+        from tabulate import tabulate
+
+        total_wall: float = sum(
+            stage["wall_seconds"] for stage in self._stages.values()
+        )
+
+        print(
+            tabulate(
+                (
+                    (
+                        name,
+                        f"{stage['wall_seconds'] * 1000:.1f}",
+                        f"{stage['cpu_seconds'] * 1000:.1f}",
+                        f"{_share(stage['wall_seconds'], total_wall):.1f}",
+                        f"{stage['allocated_bytes'] / 2**20:.2f}",
+                        f"{stage['peak_bytes'] / 2**20:.2f}",
+                    )
+                    for name, stage in self._stages.items()
+                ),
+                headers=[
+                    "Stage",
+                    "Wall (ms)",
+                    "CPU (ms)",
+                    "Wall (%)",
+                    "Retained (MiB)",
+                    "Peak (MiB)",
+                ],
+            )
+        )
+
+    def _save_report(self: Self):
+        try:
+            with open(self._report_filename, "w", encoding="utf-8") as file:
+                json.dump({"stages": self._stages}, file, indent=2)
+
+            logging.info("Saved profile report to %s", self._report_filename)
+        except Exception as e:
+            logging.error("An error occurred: %s", e)
+
+    def _save_cprofile(self: Self):
+        if len(self._cprofiles) == 0:
+            return
+
+        # Only the stage that took longest is worth reading function by function
+        hottest: str = max(
+            self._cprofiles, key=lambda name: self._stages[name]["wall_seconds"]
+        )
+
+        try:
+            self._cprofiles[hottest].dump_stats(self._cprofile_filename)
+
+            logging.info(
+                "Saved cProfile output of stage %s to %s",
+                hottest,
+                self._cprofile_filename,
+            )
+        except Exception as e:
+            logging.error("An error occurred: %s", e)
+
+
+def _cpu_time() -> float:
+    # Includes worker processes once they have been joined
+    times: os.times_result = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _share(part: float, total: float) -> float:
+    return part / total * 100 if total > 0 else 0